@@ -0,0 +1,92 @@
+import threading
+
+from django.db.backends.postgresql import base
+from psycopg2 import pool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool(pool.ThreadedConnectionPool):
+    '''
+    ThreadedConnectionPool that opens connections through the Django
+    backend, so isolation level and type adapters are set up as usual
+    '''
+
+    def __init__(self, minconn, maxconn, connect):
+        self._connect_with = connect
+        super().__init__(minconn, maxconn)
+
+    def _connect(self, key=None):
+        connection = self._connect_with()
+        if key is not None:
+            self._used[key] = connection
+            self._rused[id(connection)] = key
+        else:
+            self._pool.append(connection)
+        return connection
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    '''
+    PostgreSQL backend with health checks of persistent connections
+    and an optional process-wide connection pool.
+
+    HEALTH_CHECKS: a reused connection is pinged before the first query
+    of a request and reopened if the server dropped it.
+    POOL: {'MIN_SIZE': idle connections kept, 'MAX_SIZE': hard limit},
+    connections are borrowed on connect and given back on close, meant
+    for threaded and gevent workers with CONN_MAX_AGE = 0.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_done = False
+
+    @property
+    def pool_options(self):
+        return self.settings_dict.get('POOL')
+
+    def get_pool(self, conn_params):
+        with _pools_lock:
+            if self.alias not in _pools:
+                _pools[self.alias] = ConnectionPool(
+                    self.pool_options.get('MIN_SIZE', 1),
+                    self.pool_options.get('MAX_SIZE', 10),
+                    lambda: super(DatabaseWrapper, self).get_new_connection(
+                        conn_params
+                    ),
+                )
+            return _pools[self.alias]
+
+    def get_new_connection(self, conn_params):
+        if not self.pool_options:
+            return super().get_new_connection(conn_params)
+        connections = self.get_pool(conn_params)
+        connection = connections.getconn()
+        if connection.closed:
+            connections.putconn(connection, close=True)
+            connection = connections.getconn()
+        return connection
+
+    def _close(self):
+        if self.connection is None or not self.pool_options:
+            return super()._close()
+        with self.wrap_database_errors:
+            _pools[self.alias].putconn(self.connection)
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def ensure_connection(self):
+        if (self.connection is not None and not self.health_check_done
+                and self.settings_dict.get('HEALTH_CHECKS')):
+            if not self.in_atomic_block and not self.is_usable():
+                self.close()
+            self.health_check_done = True
+        super().ensure_connection()
@@ -0,0 +1,188 @@
+import bisect
+import json
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from rest_framework import renderers
+
+current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    '''
+    Numbers of one sampled request, queries may come from several
+    threads (recipes.concurrency) so they are added under a lock
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.db = 0.0
+        self.serializer = 0.0
+        self.serializing = False
+
+    def add_query(self, duration):
+        with self.lock:
+            self.queries += 1
+            self.db += duration
+
+
+def record_query(execute, sql, params, many, context):
+    '''
+    Execute wrapper installed on every connection, only a sampled
+    request pays for the timing
+    '''
+    timings = current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(time.perf_counter() - started)
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def timed_serializer(cls):
+    '''
+    Class decorator adding the time spent in the outermost
+    to_representation to the serializer timing of a sampled request
+    '''
+    to_representation = cls.to_representation
+
+    @wraps(to_representation)
+    def timed(self, instance):
+        timings = current.get()
+        if timings is None or timings.serializing:
+            return to_representation(self, instance)
+        timings.serializing = True
+        started = time.perf_counter()
+        try:
+            return to_representation(self, instance)
+        finally:
+            timings.serializing = False
+            timings.serializer += time.perf_counter() - started
+
+    cls.to_representation = timed
+    return cls
+
+
+class RouteStats:
+    def __init__(self, buckets):
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.duration = 0.0
+        self.queries = 0
+        self.db = 0.0
+        self.serializer = 0.0
+        self.bytes = 0
+
+
+class Registry:
+    '''
+    Per-route histograms of the sampled requests of this process
+    '''
+
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def observe(self, route, method, duration, timings, size):
+        with self.lock:
+            stats = self.routes.get((route, method))
+            if stats is None:
+                stats = self.routes[route, method] = RouteStats(self.buckets)
+            stats.bucket_counts[
+                bisect.bisect_left(self.buckets, duration)
+            ] += 1
+            stats.count += 1
+            stats.duration += duration
+            stats.queries += timings.queries
+            stats.db += timings.db
+            stats.serializer += timings.serializer
+            stats.bytes += size
+
+    def snapshot(self):
+        with self.lock:
+            routes = []
+            for (route, method), stats in sorted(self.routes.items()):
+                cumulative = 0
+                buckets = []
+                for bound, count in zip(
+                    [*self.buckets, '+Inf'], stats.bucket_counts
+                ):
+                    cumulative += count
+                    buckets.append([bound, cumulative])
+                routes.append({
+                    'route': route,
+                    'method': method,
+                    'count': stats.count,
+                    'duration': stats.duration,
+                    'buckets': buckets,
+                    'queries': stats.queries,
+                    'db': stats.db,
+                    'serializer': stats.serializer,
+                    'bytes': stats.bytes,
+                })
+        return {'routes': routes}
+
+    def clear(self):
+        with self.lock:
+            self.routes.clear()
+
+
+registry = Registry(settings.PERFORMANCE_BUCKETS)
+
+# metric name, snapshot key, type, help
+TOTALS = (
+    ('foodgram_db_queries_total', 'queries', 'counter',
+     'Database queries made by sampled requests'),
+    ('foodgram_db_duration_seconds_total', 'db', 'counter',
+     'Time spent in database queries'),
+    ('foodgram_serializer_duration_seconds_total', 'serializer', 'counter',
+     'Time spent in serializers'),
+    ('foodgram_response_bytes_total', 'bytes', 'counter',
+     'Size of non-streaming responses'),
+)
+
+
+class PrometheusRenderer(renderers.BaseRenderer):
+    '''
+    Registry snapshot in the Prometheus text exposition format
+    '''
+    media_type = 'text/plain; version=0.0.4'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only error responses have no routes
+        if 'routes' not in data:
+            return json.dumps(data, ensure_ascii=False).encode(self.charset)
+        name = 'foodgram_request_duration_seconds'
+        lines = [
+            f'# HELP {name} Wall time of sampled requests',
+            f'# TYPE {name} histogram',
+        ]
+        for route in data['routes']:
+            labels = f'route="{route["route"]}",method="{route["method"]}"'
+            for bound, count in route['buckets']:
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{name}_sum{{{labels}}} {route["duration"]}')
+            lines.append(f'{name}_count{{{labels}}} {route["count"]}')
+        for metric, key, kind, description in TOTALS:
+            lines.append(f'# HELP {metric} {description}')
+            lines.append(f'# TYPE {metric} {kind}')
+            for route in data['routes']:
+                labels = (
+                    f'route="{route["route"]}",method="{route["method"]}"'
+                )
+                lines.append(f'{metric}{{{labels}}} {route[key]}')
+        return '\n'.join(lines) + '\n'
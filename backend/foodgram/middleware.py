@@ -0,0 +1,72 @@
+import asyncio
+import random
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.decorators import sync_and_async_middleware
+
+from foodgram import metrics
+
+
+def server_timing(duration, timings):
+    return (
+        f'total;dur={duration * 1000:.1f}, '
+        f'db;dur={timings.db * 1000:.1f};desc="{timings.queries} queries", '
+        f'serializer;dur={timings.serializer * 1000:.1f}'
+    )
+
+
+def start_sample(rate):
+    if random.random() >= rate:
+        return None
+    timings = metrics.RequestTimings()
+    return timings, metrics.current.set(timings), time.perf_counter()
+
+
+def finish_sample(request, response, sample):
+    timings, token, started = sample
+    duration = time.perf_counter() - started
+    metrics.current.reset(token)
+    response['Server-Timing'] = server_timing(duration, timings)
+    match = request.resolver_match
+    metrics.registry.observe(
+        match.view_name if match else '<unresolved>',
+        request.method,
+        duration,
+        timings,
+        0 if response.streaming else len(response.content),
+    )
+    return response
+
+
+@sync_and_async_middleware
+def performance_middleware(get_response):
+    '''
+    Wall time, query count, database and serializer time of a sampled
+    request go to the Server-Timing header and to the per-route
+    histograms of foodgram.metrics. Not used at all with a zero
+    PERFORMANCE_SAMPLE_RATE
+    '''
+    rate = settings.PERFORMANCE_SAMPLE_RATE
+    if rate <= 0:
+        raise MiddlewareNotUsed
+    connection_created.connect(metrics.install_query_recorder)
+    for connection in connections.all():
+        metrics.install_query_recorder(connection)
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            sample = start_sample(rate)
+            if sample is None:
+                return await get_response(request)
+            return finish_sample(request, await get_response(request), sample)
+    else:
+        def middleware(request):
+            sample = start_sample(rate)
+            if sample is None:
+                return get_response(request)
+            return finish_sample(request, get_response(request), sample)
+    return middleware
@@ -1,4 +1,5 @@
 import os
+import sys
 
 from pathlib import Path
 
@@ -10,6 +11,8 @@ SECRET_KEY = config('SECRET_KEY')
 
 DEBUG = config('DEBUG', cast=bool)
 
+TESTING = sys.argv[1:2] == ['test']
+
 ALLOWED_HOSTS = config('ALLOWED_HOSTS', cast=Csv())
 
 INSTALLED_APPS = [
@@ -29,6 +32,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.middleware.performance_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -67,8 +71,98 @@ DATABASES = {
         'PASSWORD': config('POSTGRES_PASSWORD'),
         'HOST': config('DB_HOST'),
         'PORT': config('DB_PORT', cast=int),
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'HEALTH_CHECKS': config('DB_HEALTH_CHECKS', default=True, cast=bool),
+    }
+}
+
+if config('DB_POOL', default=False, cast=bool):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['POOL'] = {
+        'MIN_SIZE': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+        'MAX_SIZE': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+    }
+
+# The response cache generation, the ETag table versions and the
+# ingredient search index version live here, so every worker and every
+# management command has to share it: the database table (made by
+# createcachetable), files on one volume, Redis or Memcached.
+# locmem is per process, with it the response cache and ETags are off
+CACHES = {
+    'default': {
+        'BACKEND': config(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.db.DatabaseCache'
+        ),
+        'LOCATION': config('CACHE_LOCATION', default='foodgram_cache'),
     }
 }
+if TESTING:
+    # One process, nothing to share
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'foodgram',
+    }
+CACHE_SHARED = TESTING or not CACHES['default']['BACKEND'].endswith(
+    'LocMemCache'
+)
+
+# Turned on by foodgram/asgi.py, read endpoints are then served by
+# async views, see recipes/concurrency.py
+ASYNC_READ_VIEWS = config('ASYNC_READ_VIEWS', default=False, cast=bool)
+CONCURRENT_QUERY_THREADS = config('CONCURRENT_QUERY_THREADS', default=8, cast=int)
+
+# Share of requests timed by foodgram.middleware, 0 turns it off
+PERFORMANCE_SAMPLE_RATE = config('PERFORMANCE_SAMPLE_RATE', default=0.0, cast=float)
+PERFORMANCE_BUCKETS = config(
+    'PERFORMANCE_BUCKETS',
+    default='0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10',
+    cast=Csv(float)
+)
+
+FAST_SERIALIZERS = config('FAST_SERIALIZERS', default=True, cast=bool)
+# Tags and ingredients of recipes aggregated to json in the recipe query
+# on PostgreSQL instead of being prefetched
+RECIPES_JSON_RELATIONS = config('RECIPES_JSON_RELATIONS', default=True, cast=bool)
+
+RECIPES_CACHE_ENABLED = CACHE_SHARED and config('RECIPES_CACHE_ENABLED', default=True, cast=bool)
+RECIPES_ETAGS_ENABLED = CACHE_SHARED
+RECIPES_CACHE_ALIAS = 'default'
+RECIPES_CACHE_TIMEOUT = config('RECIPES_CACHE_TIMEOUT', default=300, cast=int)
+# How long recipe changes stay in the journal of the in-memory indexes.
+# The journal is the recipes_recipechange table rather than the cache:
+# locmem is per process and FileBasedCache has no atomic incr, so the
+# processes would miss each other's changes. An index not synced for
+# longer than this is rebuilt
+RECIPES_JOURNAL_TIMEOUT = config('RECIPES_JOURNAL_TIMEOUT', default=24 * 60 * 60, cast=int)
+
+CATALOGUE_CACHE_MAX_AGE = config('CATALOGUE_CACHE_MAX_AGE', default=60, cast=int)
+
+# Text search configuration of the recipe search index on PostgreSQL
+RECIPE_SEARCH_CONFIG = config('RECIPE_SEARCH_CONFIG', default='russian')
+
+INGREDIENT_SEARCH_LIMIT = config('INGREDIENT_SEARCH_LIMIT', default=50, cast=int)
+INGREDIENT_SEARCH_MAX_LIMIT = 200
+
+RECIPE_MATCH_LIMIT = config('RECIPE_MATCH_LIMIT', default=20, cast=int)
+RECIPE_MATCH_MAX_LIMIT = 100
+RECIPE_MATCH_MAX_INGREDIENTS = 200
+
+RECIPE_FEED_MAX_LIMIT = 100
+
+# ?ordering=popular and ?ordering=trending, scored by score_recipes
+RECIPE_SCORE_FAVORITE_WEIGHT = config('RECIPE_SCORE_FAVORITE_WEIGHT', default=1.0, cast=float)
+RECIPE_SCORE_SHOPPING_WEIGHT = config('RECIPE_SCORE_SHOPPING_WEIGHT', default=0.5, cast=float)
+RECIPE_TRENDING_HALF_LIFE = config('RECIPE_TRENDING_HALF_LIFE', default=72 * 60 * 60, cast=int)
+
+TOGGLE_BATCH_LIMIT = config('TOGGLE_BATCH_LIMIT', default=100, cast=int)
+
+SUBSCRIPTION_RECIPES_LIMIT = config('SUBSCRIPTION_RECIPES_LIMIT', default=50, cast=int)
+
+SHOPPING_LIST_PDF_FONT = config(
+    'SHOPPING_LIST_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -103,6 +197,17 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+IMAGE_RENDITIONS = {
+    'image_thumb': config('IMAGE_THUMB_WIDTH', default=320, cast=int),
+    'image_medium': config('IMAGE_MEDIUM_WIDTH', default=960, cast=int),
+}
+IMAGE_RENDITION_FORMAT = config('IMAGE_RENDITION_FORMAT', default='WEBP')
+IMAGE_RENDITION_QUALITY = config('IMAGE_RENDITION_QUALITY', default=80, cast=int)
+# Jobs still queued when a worker stops are lost, make_image_renditions
+# picks up the recipes left without renditions. Tests make them inline
+IMAGE_RENDITIONS_ASYNC = not TESTING and config('IMAGE_RENDITIONS_ASYNC', default=True, cast=bool)
+IMAGE_RENDITION_WORKERS = config('IMAGE_RENDITION_WORKERS', default=2, cast=int)
+
 CORS_ORIGIN_ALLOW_ALL = True
 CORS_URLS_REGEX = r'^/api/.*$'
 
@@ -116,6 +221,11 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
 
+    'DEFAULT_RENDERER_CLASSES': [
+        'recipes.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
@@ -1,9 +1,12 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from foodgram.views import MetricsView
+
 api_urlpatterns = [
     path('', include('users.urls')),
     path('', include('recipes.urls')),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
 
 urlpatterns = [
@@ -0,0 +1,21 @@
+from rest_framework import permissions, renderers
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from foodgram.metrics import PrometheusRenderer, registry
+from recipes.renderers import FormatNegotiation
+
+
+class MetricsView(APIView):
+    '''
+    Per-route histograms of the sampled requests of this process,
+    Prometheus text by default and JSON with ?format=json
+    '''
+    permission_classes = [permissions.IsAdminUser]
+    renderer_classes = [PrometheusRenderer, renderers.JSONRenderer]
+    # Scrapers ask for text/plain with or without the version
+    content_negotiation_class = FormatNegotiation
+    pagination_class = None
+
+    def get(self, request):
+        return Response(registry.snapshot())
@@ -0,0 +1,31 @@
+import multiprocessing
+
+from decouple import config
+
+bind = config('GUNICORN_BIND', default='0.0.0.0:8000')
+
+# DRF handlers mostly wait on PostgreSQL, threads keep a worker busy
+# while one of its requests waits on the database
+worker_class = config('GUNICORN_WORKER_CLASS', default='gthread')
+workers = config(
+    'GUNICORN_WORKERS', default=multiprocessing.cpu_count() * 2 + 1, cast=int
+)
+threads = config('GUNICORN_THREADS', default=4, cast=int)
+worker_connections = config(
+    'GUNICORN_WORKER_CONNECTIONS', default=100, cast=int
+)
+
+# nginx keeps upstream connections open, see infra/nginx.conf
+keepalive = config('GUNICORN_KEEPALIVE', default=5, cast=int)
+timeout = config('GUNICORN_TIMEOUT', default=30, cast=int)
+graceful_timeout = 30
+max_requests = config('GUNICORN_MAX_REQUESTS', default=1000, cast=int)
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
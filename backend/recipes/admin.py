@@ -1,7 +1,8 @@
 from django.contrib import admin
 
 from recipes.models import (
-    Favorite, Ingredient, IngredientInRecipe, Recipe, Shopping, Tag,
+    Favorite, Ingredient, IngredientInRecipe, Recipe, Shopping,
+    ShoppingListItem, Tag,
 )
 
 
@@ -24,9 +25,12 @@ class RecipeAdmin(admin.ModelAdmin):
     filter_horizontal = ('tags', 'ingredients')
     empty_value_display = '-empty-'
 
-    @admin.display(description='Число добавлений в избранное')
+    @admin.display(
+        description='Число добавлений в избранное',
+        ordering='favorites_count'
+    )
     def is_favorited(self, obj):
-        return obj.favorite.count()
+        return obj.favorites_count
 
 
 class IngredientInRecipeAdmin(admin.ModelAdmin):
@@ -49,9 +53,17 @@ class ShoppingAdmin(admin.ModelAdmin):
     empty_value_display = '-empty-'
 
 
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'user', 'ingredient', 'total_amount')
+    list_filter = ('user', )
+    readonly_fields = ('user', 'ingredient', 'total_amount')
+    empty_value_display = '-empty-'
+
+
 admin.site.register(Tag, TagAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(IngredientInRecipe, IngredientInRecipeAdmin)
 admin.site.register(Favorite, FavoriteAdmin)
 admin.site.register(Shopping, ShoppingAdmin)
+admin.site.register(ShoppingListItem, ShoppingListItemAdmin)
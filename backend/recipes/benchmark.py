@@ -0,0 +1,477 @@
+import base64
+import random
+import statistics
+import time
+from datetime import timedelta
+from io import BytesIO
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from foodgram import metrics
+from recipes import cache, journal, scoring, search, shopping_list
+from recipes.counters import recount
+from recipes.models import (
+    Favorite, Ingredient, IngredientInRecipe, Recipe, Shopping, Tag,
+)
+from users.models import Follow
+
+User = get_user_model()
+
+MEASUREMENT_UNITS = ('г', 'кг', 'мл', 'шт.', 'ст. л.', 'ч. л.', 'по вкусу')
+IMAGE_NAME = 'recipes/benchmark.png'
+PAGES = 20
+# Favorites and cart rows are spread over this many days back
+EVENT_DAYS = 30
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def image_base64():
+    buffer = BytesIO()
+    Image.new('RGB', (64, 64), (200, 120, 40)).save(buffer, 'PNG')
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+def ids(model):
+    return list(model.objects.order_by('pk').values_list('pk', flat=True))
+
+
+class Seeder:
+    '''
+    Fills an empty database with generated users, recipes and the
+    relations between them, bulk inserts only. The same seed gives
+    the same data
+    '''
+
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        self.fake = Faker()
+        self.fake.seed_instance(seed)
+
+    def users(self, count):
+        password = make_password('benchmark')
+        User.objects.bulk_create(
+            User(
+                username=f'{self.fake.user_name()}{number}',
+                email=f'user{number}@example.com',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=password,
+            )
+            for number in range(count)
+        )
+        Token.objects.bulk_create(
+            Token(user_id=user_id, key=Token.generate_key())
+            for user_id in ids(User)
+        )
+
+    def tags(self, count):
+        Tag.objects.bulk_create(
+            Tag(
+                name=f'{self.fake.word()} {number}',
+                color=f'#{number:06X}',
+                slug=f'tag-{number}',
+            )
+            for number in range(count)
+        )
+
+    def ingredients(self, count):
+        Ingredient.objects.bulk_create(
+            Ingredient(
+                name=f'{self.fake.word()} {number}',
+                measurement_unit=self.random.choice(MEASUREMENT_UNITS),
+            )
+            for number in range(count)
+        )
+
+    def recipes(self, count, per_recipe):
+        user_ids, tag_ids = ids(User), ids(Tag)
+        ingredient_ids = ids(Ingredient)
+        Recipe.objects.bulk_create(
+            Recipe(
+                name=self.fake.sentence(nb_words=3)[:200],
+                author_id=self.random.choice(user_ids),
+                image=IMAGE_NAME,
+                text=self.fake.paragraph(),
+                cooking_time=self.random.randint(1, 180),
+            )
+            for _ in range(count)
+        )
+        recipe_ids = ids(Recipe)
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=self.random.randint(1, 500),
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in self.random.sample(
+                ingredient_ids, min(per_recipe, len(ingredient_ids))
+            )
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in self.random.sample(
+                tag_ids, min(self.random.randint(1, 3), len(tag_ids))
+            )
+        )
+
+    def relations(self, model, field, target_ids, per_user, days=0):
+        '''
+        per_user random targets for every user, never the user itself.
+        With days the rows get a random created within as many days back
+        '''
+        now = timezone.now()
+        rows = []
+        for user_id in ids(User):
+            targets = [pk for pk in target_ids if pk != user_id]
+            for target_id in self.random.sample(
+                    targets, min(per_user, len(targets))):
+                values = {'user_id': user_id, field: target_id}
+                if days:
+                    values['created'] = now - timedelta(
+                        seconds=self.random.uniform(0, days * 24 * 60 * 60)
+                    )
+                rows.append(model(**values))
+        model.objects.bulk_create(rows)
+
+    def feed_reader(self, count):
+        '''
+        The first user follows count more authors, for the feed of
+        someone following thousands of them
+        '''
+        reader, *authors = ids(User)
+        Follow.objects.bulk_create(
+            (
+                Follow(user_id=reader, author_id=author_id)
+                for author_id in self.random.sample(
+                    authors, min(count, len(authors))
+                )
+            ),
+            ignore_conflicts=True
+        )
+
+    def seed(self, volumes):
+        with transaction.atomic():
+            self.users(volumes['users'])
+            self.tags(volumes['tags'])
+            self.ingredients(volumes['ingredients'])
+            self.recipes(volumes['recipes'], volumes['per_recipe'])
+            recipe_ids = ids(Recipe)
+            self.relations(
+                Favorite, 'recipe_id', recipe_ids, volumes['favorites'],
+                EVENT_DAYS
+            )
+            self.relations(
+                Shopping, 'recipe_id', recipe_ids, volumes['cart'],
+                EVENT_DAYS
+            )
+            self.relations(Follow, 'author_id', ids(User), volumes['follows'])
+            self.feed_reader(volumes['feed_follows'])
+            # Bulk inserts skip the signals keeping these up to date
+            recount()
+            scoring.update_scores(full=True)
+            shopping_list.rebuild(ids(User))
+            search.index_recipes()
+            journal.reset()
+        for model in (User, Tag, Ingredient, Recipe, Favorite, Shopping,
+                      Follow):
+            cache.touch_table(model)
+        cache.bump_generation()
+
+
+class Benchmark:
+    '''
+    Runs every scenario through the whole Django stack with the test
+    client and measures latency, queries and throughput
+    '''
+
+    def __init__(self, requests, warmup, seed=0):
+        self.requests = requests
+        self.warmup = warmup
+        self.random = random.Random(seed)
+        self.client = APIClient()
+        self.image = image_base64()
+        self.tokens = dict(Token.objects.values_list('user_id', 'key'))
+        self.user_ids = list(self.tokens)
+        self.recipe_authors = dict(Recipe.objects.values_list('id', 'author'))
+        self.recipe_ids = list(self.recipe_authors)
+        self.recipe_names = list(Recipe.objects.values_list('name', flat=True))
+        self.tag_ids = ids(Tag)
+        self.tag_slugs = list(Tag.objects.values_list('slug', flat=True))
+        self.ingredient_ids = ids(Ingredient)
+        self.ingredient_names = list(
+            Ingredient.objects.values_list('name', flat=True)
+        )
+        self.pages = max(1, min(PAGES, len(self.recipe_ids) // 10))
+        self.reader = min(self.user_ids)
+        followed = set(Follow.objects.filter(
+            user=self.reader
+        ).values_list('author', flat=True))
+        self.feed_ids = sorted(
+            (pk for pk, author in self.recipe_authors.items()
+             if author in followed),
+            reverse=True
+        )
+        metrics.install_query_recorder(connection)
+
+    def scenarios(self):
+        '''
+        Name and a function returning (method, path, data, user id),
+        writes go last so the reads see the seeded data only
+        '''
+        return {
+            'recipes_list': self.recipes_list,
+            'recipes_list_anonymous': self.recipes_list_anonymous,
+            'recipes_list_tags': self.recipes_list_tags,
+            'recipes_list_author': self.recipes_list_author,
+            'recipes_list_favorited': self.recipes_list_favorited,
+            'recipes_list_in_shopping_cart': self.recipes_list_in_cart,
+            'recipes_list_popular': self.recipes_list_popular,
+            'recipes_list_trending': self.recipes_list_trending,
+            'recipes_search': self.recipes_search,
+            'recipes_match': self.recipes_match,
+            'recipe_detail': self.recipe_detail,
+            'download_shopping_cart': self.download_shopping_cart,
+            'subscriptions': self.subscriptions,
+            'feed_first_page': self.feed_first_page,
+            'feed_deep_page': self.feed_deep_page,
+            'ingredient_search': self.ingredient_search,
+            'recipe_create': self.recipe_create,
+            'recipe_update': self.recipe_update,
+        }
+
+    def user(self):
+        return self.random.choice(self.user_ids)
+
+    def page(self):
+        return self.random.randint(1, self.pages)
+
+    def recipes_list(self):
+        return 'get', f'/api/recipes/?page={self.page()}', None, self.user()
+
+    def recipes_list_anonymous(self):
+        return 'get', f'/api/recipes/?page={self.page()}', None, None
+
+    def recipes_list_tags(self):
+        tags = '&'.join(
+            f'tags={slug}' for slug in self.random.sample(
+                self.tag_slugs, min(2, len(self.tag_slugs))
+            )
+        )
+        return 'get', f'/api/recipes/?{tags}', None, self.user()
+
+    def recipes_list_author(self):
+        return (
+            'get', f'/api/recipes/?author={self.user()}', None, self.user()
+        )
+
+    def recipes_list_favorited(self):
+        return 'get', '/api/recipes/?is_favorited=true', None, self.user()
+
+    def recipes_list_in_cart(self):
+        return (
+            'get', '/api/recipes/?is_in_shopping_cart=true', None, self.user()
+        )
+
+    def recipes_list_popular(self):
+        return (
+            'get', f'/api/recipes/?ordering=popular&page={self.page()}',
+            None, self.user()
+        )
+
+    def recipes_list_trending(self):
+        return (
+            'get', f'/api/recipes/?ordering=trending&page={self.page()}',
+            None, self.user()
+        )
+
+    def recipes_search(self):
+        words = self.random.choice(self.recipe_names).split()
+        return (
+            'get', f'/api/recipes/?search={self.random.choice(words)}',
+            None, self.user()
+        )
+
+    def recipes_match(self):
+        have = '&'.join(
+            f'ingredients={pk}' for pk in self.random.sample(
+                self.ingredient_ids, min(15, len(self.ingredient_ids))
+            )
+        )
+        return 'get', f'/api/recipes/match/?{have}', None, None
+
+    def recipe_detail(self):
+        recipe_id = self.random.choice(self.recipe_ids)
+        return 'get', f'/api/recipes/{recipe_id}/', None, self.user()
+
+    def download_shopping_cart(self):
+        return (
+            'get', '/api/recipes/download_shopping_cart/?format=txt',
+            None, self.user()
+        )
+
+    def subscriptions(self):
+        return 'get', '/api/users/subscriptions/', None, self.user()
+
+    def feed_first_page(self):
+        return 'get', '/api/recipes/feed/', None, self.reader
+
+    def feed_deep_page(self):
+        '''
+        A page from the oldest tenth of the feed of the same user
+        '''
+        tail = self.feed_ids[len(self.feed_ids) * 9 // 10:]
+        if not tail:
+            return self.feed_first_page()
+        cursor = base64.b64encode(
+            f'p={self.random.choice(tail)}'.encode()
+        ).decode()
+        return (
+            'get', f'/api/recipes/feed/?{urlencode({"cursor": cursor})}',
+            None, self.reader
+        )
+
+    def ingredient_search(self):
+        name = self.random.choice(self.ingredient_names)
+        start = self.random.randint(0, max(0, len(name) - 3))
+        value = name[start:start + self.random.randint(1, 3)]
+        return 'get', f'/api/ingredients/?name={value}', None, None
+
+    def recipe_payload(self):
+        return {
+            'name': f'Benchmark {self.random.randint(1, 10 ** 6)}',
+            'text': 'Benchmark recipe',
+            'cooking_time': self.random.randint(1, 180),
+            'image': self.image,
+            'tags': self.random.sample(
+                self.tag_ids, min(2, len(self.tag_ids))
+            ),
+            'ingredients': [
+                {'id': ingredient_id, 'amount': self.random.randint(1, 500)}
+                for ingredient_id in self.random.sample(
+                    self.ingredient_ids, min(5, len(self.ingredient_ids))
+                )
+            ],
+        }
+
+    def recipe_create(self):
+        return 'post', '/api/recipes/', self.recipe_payload(), self.user()
+
+    def recipe_update(self):
+        recipe_id = self.random.choice(self.recipe_ids)
+        return (
+            'put', f'/api/recipes/{recipe_id}/', self.recipe_payload(),
+            self.recipe_authors[recipe_id]
+        )
+
+    def request(self, method, path, data, user_id):
+        if user_id is None:
+            self.client.credentials()
+        else:
+            self.client.credentials(
+                HTTP_AUTHORIZATION=f'Token {self.tokens[user_id]}'
+            )
+        kwargs = {} if data is None else {'data': data, 'format': 'json'}
+        timings = metrics.RequestTimings()
+        token = metrics.current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = getattr(self.client, method)(path, **kwargs)
+            if response.streaming:
+                size = sum(map(len, response.streaming_content))
+            else:
+                size = len(response.content)
+            duration = time.perf_counter() - started
+        finally:
+            metrics.current.reset(token)
+        if response.status_code >= 400:
+            raise BenchmarkError(
+                f'{method.upper()} {path}: {response.status_code}'
+            )
+        return duration, timings, size
+
+    def measure(self, scenario):
+        for _ in range(self.warmup):
+            self.request(*scenario())
+        samples = []
+        started = time.perf_counter()
+        for _ in range(self.requests):
+            samples.append(self.request(*scenario()))
+        return summarize(samples, time.perf_counter() - started)
+
+    def run(self, names=None):
+        return {
+            name: self.measure(scenario)
+            for name, scenario in self.scenarios().items()
+            if not names or name in names
+        }
+
+
+def summarize(samples, total):
+    durations = [duration * 1000 for duration, _, _ in samples]
+    queries = [timings.queries for _, timings, _ in samples]
+    return {
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / total, 1),
+        'latency_ms': {
+            'mean': round(statistics.mean(durations), 3),
+            'p50': round(percentile(durations, 50), 3),
+            'p95': round(percentile(durations, 95), 3),
+            'p99': round(percentile(durations, 99), 3),
+            'max': round(max(durations), 3),
+        },
+        'queries': {
+            'mean': round(statistics.mean(queries), 2),
+            'max': max(queries),
+        },
+        'db_ms': round(statistics.mean(
+            timings.db * 1000 for _, timings, _ in samples
+        ), 3),
+        'serializer_ms': round(statistics.mean(
+            timings.serializer * 1000 for _, timings, _ in samples
+        ), 3),
+        'response_bytes': round(statistics.mean(
+            size for _, _, size in samples
+        )),
+    }
+
+
+def find_regressions(baseline, results, tolerance, min_delta):
+    '''
+    Scenarios slower than the baseline by more than tolerance (a share)
+    and min_delta milliseconds, or making more queries
+    '''
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for key in ('p50', 'p95'):
+            before = previous['latency_ms'][key]
+            after = current['latency_ms'][key]
+            if after > before * (1 + tolerance) and after - before > min_delta:
+                regressions.append(
+                    f'{name}: {key} {before:.2f}ms -> {after:.2f}ms'
+                )
+        before, after = previous['queries']['max'], current['queries']['max']
+        if after > before:
+            regressions.append(f'{name}: queries {before} -> {after}')
+    return regressions
@@ -0,0 +1,138 @@
+import hashlib
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+
+from recipes.concurrency import run_concurrently
+from recipes.models import Favorite, Shopping
+from users.models import Follow
+
+GENERATION_KEY = 'recipes:generation'
+HITS_KEY = 'recipes:hits'
+MISSES_KEY = 'recipes:misses'
+VERSION_KEY = 'versions:{}'
+
+
+def get_cache():
+    return caches[settings.RECIPES_CACHE_ALIAS]
+
+
+def _new_generation():
+    # Time based, so a generation lost by eviction never comes back
+    return int(time.time() * 1000)
+
+
+def get_generation():
+    return get_cache().get_or_set(GENERATION_KEY, _new_generation, None)
+
+
+def bump_generation():
+    cache = get_cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, _new_generation(), None)
+
+
+def get_table_version(model):
+    '''
+    Millisecond stamp of the last change in the model table
+    '''
+    key = VERSION_KEY.format(model._meta.label_lower)
+    return get_cache().get_or_set(key, _new_generation, None)
+
+
+def touch_table(model):
+    cache = get_cache()
+    key = VERSION_KEY.format(model._meta.label_lower)
+    previous = cache.get(key, 0)
+    cache.set(key, max(_new_generation(), previous + 1), None)
+
+
+def make_key(request, prefix, version=None):
+    '''
+    Key covers host (links are absolute), path and all query params,
+    version is whatever else the payload depends on
+    '''
+    params = sorted(
+        (name, sorted(values))
+        for name, values in request.query_params.lists()
+    )
+    raw = f'{request.get_host()}{request.path}{params}'
+    if version is not None:
+        raw += f':{version}'
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f'{prefix}:{get_generation()}:{digest}'
+
+
+def _count(key):
+    cache = get_cache()
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def load(key):
+    data = get_cache().get(key)
+    _count(MISSES_KEY if data is None else HITS_KEY)
+    return data
+
+
+def store(key, data):
+    get_cache().set(key, data, settings.RECIPES_CACHE_TIMEOUT)
+
+
+def get_stats():
+    cache = get_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'generation': get_generation(),
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+    }
+
+
+def id_set(queryset, field):
+    return set(queryset.values_list(field, flat=True))
+
+
+def overlay_user_flags(recipes, user, concurrent=False):
+    '''
+    Put per-user flags on recipes serialized for an anonymous user,
+    with concurrent=True the three lookups run at the same time
+    '''
+    if not user.is_authenticated or not recipes:
+        return recipes
+    recipe_ids = [recipe['id'] for recipe in recipes]
+    author_ids = {recipe['author']['id'] for recipe in recipes}
+    lookups = (
+        partial(id_set, Favorite.objects.filter(
+            user=user, recipe__in=recipe_ids
+        ), 'recipe'),
+        partial(id_set, Shopping.objects.filter(
+            user=user, recipe__in=recipe_ids
+        ), 'recipe'),
+        partial(id_set, Follow.objects.filter(
+            user=user, author__in=author_ids
+        ), 'author'),
+    )
+    if concurrent:
+        favorited, in_shopping_cart, subscribed = run_concurrently(*lookups)
+    else:
+        favorited, in_shopping_cart, subscribed = (
+            lookup() for lookup in lookups
+        )
+    for recipe in recipes:
+        recipe['is_favorited'] = recipe['id'] in favorited
+        recipe['is_in_shopping_cart'] = recipe['id'] in in_shopping_cart
+        recipe['author']['is_subscribed'] = (
+            recipe['author']['id'] in subscribed
+        )
+    return recipes
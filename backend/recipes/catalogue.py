@@ -0,0 +1,211 @@
+import csv
+import json
+import re
+from functools import partial
+from itertools import islice
+from types import SimpleNamespace
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from recipes import cache, journal, search
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+
+CHUNK_SIZE = 64 * 1024
+SEPARATORS = re.compile(r'[\s,]*')
+
+
+def iter_json_array(file, chunk_size=CHUNK_SIZE):
+    '''
+    Items of a top-level JSON array, the file is read in chunks and
+    only the current item is kept in memory
+    '''
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('Expected a JSON array')
+    position = 1
+    eof = False
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+            # A number cut at the chunk end decodes as a shorter number
+            complete = eof or end < len(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+        if not complete:
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+        position = end
+
+
+def iter_fixture(path):
+    '''
+    (model, pk, fields) from a Django JSON fixture
+    '''
+    with open(path, encoding='utf-8') as file:
+        for item in iter_json_array(file):
+            yield (
+                apps.get_model(item['model']), item.get('pk'),
+                item['fields']
+            )
+
+
+def iter_csv(path, model):
+    '''
+    (model, pk, fields) from a CSV with a header of field names,
+    an id or pk column is used as the primary key
+    '''
+    with open(path, newline='', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            pk = row.pop('pk', None) or row.pop('id', None) or None
+            yield model, pk, row
+
+
+class CatalogueLoader:
+    '''
+    Upserts rows in batches with INSERT ... ON CONFLICT, one statement
+    per batch. Rows with a pk conflict on it, rows without one on
+    conflict_field (the first unique field by default).
+    Only the fields present in the input are updated on conflict
+    '''
+
+    def __init__(self, batch_size=5000, ignore_conflicts=False,
+                 conflict_field=None):
+        self.batch_size = batch_size
+        self.ignore_conflicts = ignore_conflicts
+        self.conflict_field = conflict_field
+        self.counts = {}
+        self.connection = connections[DEFAULT_DB_ALIAS]
+
+    def get_conflict_field(self, model, with_pk):
+        if with_pk:
+            return model._meta.pk
+        if self.conflict_field:
+            return model._meta.get_field(self.conflict_field)
+        for field in model._meta.concrete_fields:
+            if field.unique and not field.primary_key:
+                return field
+        raise ValueError(f'{model._meta.label} has no unique field')
+
+    def build(self, model, pk, fields):
+        values = {}
+        for name, value in fields.items():
+            field = model._meta.get_field(name)
+            if field.many_to_many:
+                continue
+            if field.is_relation:
+                values[field.attname] = field.target_field.to_python(value)
+            else:
+                values[field.attname] = field.to_python(value)
+        if pk is not None:
+            values[model._meta.pk.attname] = model._meta.pk.to_python(pk)
+        return values
+
+    def value_getter(self, field, given):
+        '''
+        Function of a row returning the database value of the field,
+        instead of creating a model instance for every row
+        '''
+        prepare = partial(field.get_db_prep_save, connection=self.connection)
+        if given:
+            return lambda row: prepare(row[field.attname])
+        if getattr(field, 'auto_now', False) or getattr(
+                field, 'auto_now_add', False):
+            default = partial(field.pre_save, SimpleNamespace(), True)
+        else:
+            default = field.get_default
+        return lambda row: prepare(default())
+
+    def insert_sql(self, model, fields, rows, conflict_field, updated):
+        quote = self.connection.ops.quote_name
+        placeholders = '({})'.format(', '.join(['%s'] * len(fields)))
+        sql = 'INSERT INTO {} ({}) VALUES {} ON CONFLICT'.format(
+            quote(model._meta.db_table),
+            ', '.join(quote(field.column) for field in fields),
+            ', '.join([placeholders] * rows),
+        )
+        if self.ignore_conflicts:
+            return sql + ' DO NOTHING'
+        sql += f' ({quote(conflict_field.column)}) DO '
+        if not updated:
+            return sql + 'NOTHING'
+        return sql + 'UPDATE SET ' + ', '.join(
+            f'{quote(field.column)} = EXCLUDED.{quote(field.column)}'
+            for field in updated
+        )
+
+    def write(self, model, given, batch):
+        with_pk = model._meta.pk.attname in given
+        conflict_field = self.get_conflict_field(model, with_pk)
+        fields = [
+            field for field in model._meta.concrete_fields
+            if with_pk or not field.primary_key
+        ]
+        updated = [
+            field for field in fields
+            if field.attname in given and field != conflict_field
+            and not field.primary_key
+        ]
+        getters = [
+            self.value_getter(field, field.attname in given)
+            for field in fields
+        ]
+        size = (
+            self.connection.ops.bulk_batch_size(fields, batch) or len(batch)
+        )
+        with self.connection.cursor() as cursor:
+            for start in range(0, len(batch), size):
+                rows = batch[start:start + size]
+                cursor.execute(
+                    self.insert_sql(
+                        model, fields, len(rows), conflict_field, updated
+                    ),
+                    [get(row) for row in rows for get in getters]
+                )
+        self.counts[model] = self.counts.get(model, 0) + len(batch)
+
+    def load(self, rows):
+        '''
+        Writes (model, pk, fields) rows, returns rows written per model
+        '''
+        rows = iter(rows)
+        with transaction.atomic(using=self.connection.alias):
+            while True:
+                batches = {}
+                for model, pk, fields in islice(rows, self.batch_size):
+                    values = self.build(model, pk, fields)
+                    key = (model, frozenset(values))
+                    batches.setdefault(key, []).append(values)
+                if not batches:
+                    break
+                for (model, given), batch in batches.items():
+                    self.write(model, given, batch)
+            self.reset_sequences()
+            # Bulk writes send no signals the search index relies on
+            if self.counts.keys() & {Recipe, IngredientInRecipe, Ingredient}:
+                search.index_recipes()
+                journal.reset()
+        for model in self.counts:
+            cache.touch_table(model)
+        cache.bump_generation()
+        return self.counts
+
+    def reset_sequences(self):
+        statements = self.connection.ops.sequence_reset_sql(
+            no_style(), list(self.counts)
+        )
+        if statements:
+            with self.connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
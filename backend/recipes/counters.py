@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, Shopping
+
+User = get_user_model()
+
+# model, counter field, counted model, its foreign key to model
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'shopping_count', Shopping, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+)
+
+
+def change_counter(model, pk, field, delta):
+    change_counters(model, [pk], field, delta)
+
+
+def change_counters(model, pks, field, delta):
+    '''
+    Atomic in-place increment, no read-modify-write race.
+    A drifted counter is never taken below zero
+    '''
+    queryset = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def actual_count(counted_model, foreign_key):
+    return Coalesce(
+        Subquery(
+            counted_model.objects.filter(
+                **{foreign_key: OuterRef('pk')}
+            ).order_by().values(foreign_key).annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        Value(0)
+    )
+
+
+def find_drift():
+    '''
+    Number of rows with a wrong counter for every counter field
+    '''
+    drift = {}
+    for model, field, counted_model, foreign_key in COUNTERS:
+        drift[f'{model._meta.label}.{field}'] = model.objects.annotate(
+            actual=actual_count(counted_model, foreign_key)
+        ).exclude(**{field: F('actual')}).count()
+    return drift
+
+
+def recount():
+    '''
+    Rewrites every counter column from the live rows, one UPDATE per field
+    '''
+    for model, field, counted_model, foreign_key in COUNTERS:
+        model.objects.update(
+            **{field: actual_count(counted_model, foreign_key)}
+        )
@@ -0,0 +1,126 @@
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right, insort
+
+from recipes import journal
+from recipes.models import Recipe
+
+
+class AuthorRecipeIndex:
+    '''
+    Recipe ids of every author in ascending arrays, the in-memory twin
+    of the (author, -id) index. A feed page is a k-way merge of the
+    arrays of the followed authors with one heap entry per author, so
+    it costs the same however deep the page is and however many
+    recipes the authors have
+    '''
+
+    def __init__(self, rows=()):
+        self.recipes = {}
+        self.authors = {}
+        for recipe_id, author_id in rows:
+            self.add(recipe_id, author_id)
+
+    @classmethod
+    def build(cls):
+        return cls(
+            Recipe.objects.order_by('id').values_list(
+                'id', 'author'
+            ).iterator()
+        )
+
+    def __len__(self):
+        return len(self.authors)
+
+    def add(self, recipe_id, author_id):
+        recipe_ids = self.recipes.setdefault(author_id, array('l'))
+        if not recipe_ids or recipe_ids[-1] < recipe_id:
+            recipe_ids.append(recipe_id)
+        else:
+            insort(recipe_ids, recipe_id)
+        self.authors[recipe_id] = author_id
+
+    def remove(self, recipe_id):
+        author_id = self.authors.pop(recipe_id, None)
+        if author_id is None:
+            return
+        recipe_ids = self.recipes[author_id]
+        del recipe_ids[bisect_left(recipe_ids, recipe_id)]
+        if not recipe_ids:
+            del self.recipes[author_id]
+
+    def refresh(self, recipe_ids):
+        for recipe_id in recipe_ids:
+            self.remove(recipe_id)
+        for recipe_id, author_id in Recipe.objects.filter(
+                pk__in=recipe_ids).values_list('id', 'author'):
+            self.add(recipe_id, author_id)
+
+    def before(self, author_ids, position, limit):
+        '''
+        Up to limit recipe ids of the authors below position, newest
+        first
+        '''
+        heap = []
+        for author_id in author_ids:
+            recipe_ids = self.recipes.get(author_id)
+            if not recipe_ids:
+                continue
+            index = (
+                len(recipe_ids) if position is None
+                else bisect_left(recipe_ids, position)
+            ) - 1
+            if index >= 0:
+                heap.append((-recipe_ids[index], index, recipe_ids))
+        heapq.heapify(heap)
+        page = []
+        while heap and len(page) < limit:
+            recipe_id, index, recipe_ids = heap[0]
+            page.append(-recipe_id)
+            if index:
+                heapq.heapreplace(
+                    heap, (-recipe_ids[index - 1], index - 1, recipe_ids)
+                )
+            else:
+                heapq.heappop(heap)
+        return page
+
+    def after(self, author_ids, position, limit):
+        '''
+        Up to limit recipe ids of the authors above position, oldest
+        first
+        '''
+        heap = []
+        for author_id in author_ids:
+            recipe_ids = self.recipes.get(author_id)
+            if not recipe_ids:
+                continue
+            index = bisect_right(recipe_ids, position)
+            if index < len(recipe_ids):
+                heap.append((recipe_ids[index], index, recipe_ids))
+        heapq.heapify(heap)
+        page = []
+        while heap and len(page) < limit:
+            recipe_id, index, recipe_ids = heap[0]
+            page.append(recipe_id)
+            if index + 1 < len(recipe_ids):
+                heapq.heapreplace(
+                    heap, (recipe_ids[index + 1], index + 1, recipe_ids)
+                )
+            else:
+                heapq.heappop(heap)
+        return page
+
+
+_index = journal.JournaledIndex(AuthorRecipeIndex)
+
+
+def recipe_page(author_ids, position, reverse, limit):
+    '''
+    Feed recipe ids past the cursor position: older ones newest first,
+    or newer ones oldest first for a reversed cursor
+    '''
+    with _index.synced() as index:
+        if reverse:
+            return index.after(author_ids, position, limit)
+        return index.before(author_ids, position, limit)
@@ -0,0 +1,15 @@
+from rest_framework import serializers
+
+
+class RenditionField(serializers.ImageField):
+    '''
+    Url of a resized copy of the recipe image, the original image url
+    is used until the copy is ready
+    '''
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return getattr(instance, self.source) or instance.image
@@ -1,20 +1,37 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django_filters import rest_framework as filters
 from django_filters.filters import (
-    BooleanFilter, CharFilter, ModelChoiceFilter, ModelMultipleChoiceFilter,
+    BooleanFilter, CharFilter, ChoiceFilter, ModelChoiceFilter,
+    ModelMultipleChoiceFilter, NumberFilter,
 )
 
 from recipes.models import Ingredient, Recipe, Tag
+from recipes.scoring import ORDERINGS
+from recipes.search import search_ingredients, search_recipes
 
 User = get_user_model()
 
 
 class IngredientFilter(filters.FilterSet):
-    name = CharFilter(label='name', field_name='name', lookup_expr='icontains')
+    name = CharFilter(label='name', method='filter_name')
+    limit = NumberFilter(label='limit', method='filter_limit', min_value=1)
 
     class Meta:
         model = Ingredient
-        fields = ['name']
+        fields = ['name', 'limit']
+
+    def filter_name(self, queryset, name, value):
+        limit = self.form.cleaned_data.get('limit')
+        limit = min(
+            int(limit or settings.INGREDIENT_SEARCH_LIMIT),
+            settings.INGREDIENT_SEARCH_MAX_LIMIT
+        )
+        return search_ingredients(queryset, value, limit)
+
+    def filter_limit(self, queryset, name, value):
+        # Applied by filter_name together with the ranking
+        return queryset
 
 
 class RecipeFilter(filters.FilterSet):
@@ -32,10 +49,20 @@ class RecipeFilter(filters.FilterSet):
         field_name='is_in_shopping_cart',
         method='filter_shopping'
     )
+    search = CharFilter(label='search', method='filter_search')
+    # Last, so it wins over the rank order of search
+    ordering = ChoiceFilter(
+        label='ordering',
+        choices=[(name, name) for name in ORDERINGS],
+        method='filter_ordering'
+    )
 
     class Meta:
         model = Recipe
-        fields = ['tags', 'author', 'is_favorited', 'is_in_shopping_cart']
+        fields = [
+            'tags', 'author', 'is_favorited', 'is_in_shopping_cart',
+            'search', 'ordering',
+        ]
 
     def filter_favorite(self, queryset, name, value):
         if value:
@@ -46,3 +73,9 @@ class RecipeFilter(filters.FilterSet):
         if value:
             return queryset.filter(shopping__user=self.request.user)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*ORDERINGS[value])
@@ -0,0 +1,123 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image
+
+from recipes import cache
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS_DIR = 'recipes/renditions/'
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_RENDITION_WORKERS,
+    thread_name_prefix='renditions'
+)
+
+
+def render(image, width):
+    rendition = image.copy()
+    if rendition.width > width:
+        height = round(rendition.height * width / rendition.width)
+        rendition = rendition.resize((width, height), Image.LANCZOS)
+    if settings.IMAGE_RENDITION_FORMAT == 'JPEG':
+        rendition = rendition.convert('RGB')
+    elif rendition.mode not in ('RGB', 'RGBA'):
+        rendition = rendition.convert('RGBA')
+    buffer = BytesIO()
+    rendition.save(
+        buffer, settings.IMAGE_RENDITION_FORMAT,
+        quality=settings.IMAGE_RENDITION_QUALITY
+    )
+    return buffer.getvalue()
+
+
+def make_renditions(recipe_id):
+    '''
+    Saves fixed-width copies of the recipe image and stores their names,
+    the copies they replace are deleted
+    '''
+    try:
+        recipe = Recipe.objects.only(
+            'image', *settings.IMAGE_RENDITIONS
+        ).get(pk=recipe_id)
+        with recipe.image.open('rb') as file:
+            image = Image.open(file)
+            image.load()
+        stem, _ = os.path.splitext(os.path.basename(recipe.image.name))
+        extension = settings.IMAGE_RENDITION_FORMAT.lower()
+        names = {}
+        for field, width in settings.IMAGE_RENDITIONS.items():
+            names[field] = default_storage.save(
+                f'{RENDITIONS_DIR}{stem}_{width}.{extension}',
+                ContentFile(render(image, width))
+            )
+        # The image may have been replaced while we were busy
+        if Recipe.objects.filter(
+            pk=recipe_id, image=recipe.image.name
+        ).update(**names):
+            delete_files(rendition_names(recipe))
+            cache.bump_generation()
+            cache.touch_table(Recipe)
+        else:
+            delete_files(names.values())
+    except Recipe.DoesNotExist:
+        pass
+    except Exception:
+        logger.exception('Renditions for recipe %s failed', recipe_id)
+
+
+def rendition_names(recipe):
+    return [
+        getattr(recipe, field).name for field in settings.IMAGE_RENDITIONS
+    ]
+
+
+def delete_files(names):
+    for name in names:
+        if name:
+            default_storage.delete(name)
+
+
+def discard_renditions(recipe):
+    '''
+    Deletes the renditions of the image being replaced once the
+    transaction commits
+    '''
+    names = rendition_names(recipe)
+    transaction.on_commit(lambda: delete_files(names))
+
+
+def make_renditions_in_worker(recipe_id):
+    try:
+        make_renditions(recipe_id)
+    finally:
+        # Worker threads own their connections
+        connection.close()
+
+
+def schedule_renditions(recipe):
+    '''
+    Renditions are made by the worker pool after the transaction commits
+    '''
+    if settings.IMAGE_RENDITIONS_ASYNC:
+        transaction.on_commit(
+            lambda: _executor.submit(make_renditions_in_worker, recipe.pk)
+        )
+    else:
+        transaction.on_commit(lambda: make_renditions(recipe.pk))
+
+
+def wait_for_renditions():
+    '''
+    Blocks until the scheduled renditions are made, for one-off
+    commands only: the worker pool can't be used afterwards
+    '''
+    _executor.shutdown(wait=True)
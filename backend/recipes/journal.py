@@ -0,0 +1,128 @@
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from recipes.models import RecipeChange
+
+# Entries are numbered before their transaction commits, a gap in the
+# numbers is waited for this long before it is taken for a rollback
+SETTLE = timedelta(minutes=1)
+
+_pruned = None
+
+
+def record_change(recipe_ids):
+    '''
+    Appends recipe ids to the change journal in the transaction of the
+    change, every process applies them to its indexes
+    '''
+    RecipeChange.objects.bulk_create(
+        RecipeChange(recipe_id=recipe_id) for recipe_id in set(recipe_ids)
+    )
+    prune()
+
+
+def reset():
+    '''
+    Makes every process rebuild its indexes, for writes that bypass
+    record_change. Appended after the commit, the writes may take
+    longer than SETTLE
+    '''
+    transaction.on_commit(lambda: RecipeChange.objects.create())
+
+
+def retention():
+    return timedelta(seconds=settings.RECIPES_JOURNAL_TIMEOUT)
+
+
+def prune():
+    '''
+    Drops entries older than RECIPES_JOURNAL_TIMEOUT, at most once
+    per hundredth of it in a process
+    '''
+    global _pruned
+    now = time.monotonic()
+    if (_pruned is not None
+            and now - _pruned < settings.RECIPES_JOURNAL_TIMEOUT / 100):
+        return
+    _pruned = now
+    RecipeChange.objects.filter(
+        created__lt=timezone.now() - retention()
+    ).delete()
+
+
+class JournaledIndex:
+    '''
+    Index of this process with the journal position it reflects.
+    index_class.build() makes a new index from the database,
+    index.refresh(recipe_ids) rereads the changed recipes
+    '''
+
+    def __init__(self, index_class):
+        self.index_class = index_class
+        self.lock = threading.Lock()
+        self.index = None
+        self.sequence = 0
+        self.built = 0
+        self.synced_at = None
+
+    def build(self, now):
+        # Entries of the last SETTLE may be preceded by ones committed
+        # after the build reads, they are applied again by the next sync
+        positions = RecipeChange.objects.aggregate(
+            sequence=Max('id', filter=Q(created__lt=now - SETTLE)),
+            built=Max('id')
+        )
+        self.sequence = positions['sequence'] or 0
+        self.built = positions['built'] or 0
+        self.index = self.index_class.build()
+        self.synced_at = now
+
+    def changed_recipes(self, now):
+        '''
+        Recipe ids changed since the last sync, None when the index
+        has to be rebuilt. The position stops at a gap in the numbers
+        until the gap settles, the entries past it are applied again
+        '''
+        settled = now - SETTLE
+        changed = set()
+        position = self.sequence
+        for number, recipe_id, created in RecipeChange.objects.filter(
+                id__gt=self.sequence).order_by('id').values_list(
+                    'id', 'recipe_id', 'created'):
+            if recipe_id is None:
+                # The rebuild after it already read its writes
+                if number > self.built:
+                    return None
+            else:
+                changed.add(recipe_id)
+            if number == position + 1 or created < settled:
+                position = number
+        self.sequence = position
+        return changed
+
+    def sync(self):
+        now = timezone.now()
+        # Entries read last time may be pruned by now
+        if self.index is None or now - self.synced_at > retention():
+            self.build(now)
+            return
+        changed = self.changed_recipes(now)
+        if changed is None:
+            self.build(now)
+            return
+        if changed:
+            self.index.refresh(changed)
+        self.synced_at = now
+
+    @contextmanager
+    def synced(self):
+        with self.lock:
+            self.sync()
+            yield self.index
@@ -0,0 +1,138 @@
+import json
+import tempfile
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings, setup_test_environment, teardown_test_environment,
+)
+from django.utils import timezone
+
+from recipes.benchmark import (
+    Benchmark, BenchmarkError, Seeder, find_regressions,
+)
+from recipes.images import wait_for_renditions
+
+VOLUMES = {
+    'users': 200,
+    'tags': 10,
+    'ingredients': 2000,
+    'recipes': 2000,
+    'per_recipe': 8,
+    'favorites': 20,
+    'cart': 5,
+    'follows': 10,
+    'feed_follows': 150,
+}
+
+
+class Command(BaseCommand):
+    help = ('Seeds a throwaway test database with generated data, '
+            'benchmarks the API hot paths and prints the results as json')
+
+    def add_arguments(self, parser):
+        for name, default in VOLUMES.items():
+            parser.add_argument(
+                f'--{name.replace("_", "-")}', type=int, default=default
+            )
+        parser.add_argument(
+            '--requests', type=int, default=100,
+            help='Measured requests per scenario'
+        )
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--scenario', action='append', default=[],
+            help='Run only this scenario, can be repeated'
+        )
+        parser.add_argument(
+            '--no-cache', action='store_true',
+            help='Benchmark with RECIPES_CACHE_ENABLED turned off'
+        )
+        parser.add_argument('--output', help='Write the json to this file')
+        parser.add_argument(
+            '--baseline',
+            help='Json of an earlier run, regressions against it fail'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Allowed latency growth as a share of the baseline'
+        )
+        parser.add_argument(
+            '--min-delta', type=float, default=1.0,
+            help='Latency growth in ms below which nothing fails'
+        )
+
+    def run(self, volumes, options):
+        Seeder(options['seed']).seed(volumes)
+        benchmark = Benchmark(
+            options['requests'], options['warmup'], options['seed']
+        )
+        try:
+            return benchmark.run(options['scenario'])
+        except BenchmarkError as error:
+            raise CommandError(error)
+        finally:
+            wait_for_renditions()
+
+    def handle(self, *args, **options):
+        volumes = {name: options[name] for name in VOLUMES}
+        cache_enabled = (
+            settings.RECIPES_CACHE_ENABLED and not options['no_cache']
+        )
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True
+        )
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(
+                    MEDIA_ROOT=media_root,
+                    CACHES={'default': {
+                        'BACKEND':
+                            'django.core.cache.backends.locmem.LocMemCache',
+                        'LOCATION': 'benchmark',
+                    }},
+                    RECIPES_CACHE_ALIAS='default',
+                    RECIPES_CACHE_ENABLED=cache_enabled,
+                    PERFORMANCE_SAMPLE_RATE=0,
+                ):
+                    scenarios = self.run(volumes, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        results = {
+            'started': timezone.now().isoformat(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'seed': options['seed'],
+            'volumes': volumes,
+            'settings': {
+                'FAST_SERIALIZERS': settings.FAST_SERIALIZERS,
+                'RECIPES_CACHE_ENABLED': cache_enabled,
+            },
+            'scenarios': scenarios,
+        }
+        output = json.dumps(results, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+        if options['baseline']:
+            self.check_baseline(options, scenarios)
+
+    def check_baseline(self, options, scenarios):
+        with open(options['baseline']) as file:
+            baseline = json.load(file)['scenarios']
+        regressions = find_regressions(
+            baseline, scenarios, options['tolerance'], options['min_delta']
+        )
+        if regressions:
+            raise CommandError(
+                'Regressions against the baseline:\n'
+                + '\n'.join(regressions)
+            )
+        self.stderr.write(self.style.SUCCESS('No regressions'))
@@ -0,0 +1,73 @@
+import random
+import string
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.benchmark import percentile
+from recipes.models import Ingredient
+from recipes.search import (
+    IngredientPrefixIndex, get_prefix_index, search_ingredients,
+)
+
+
+class Command(BaseCommand):
+    help = 'Measures ingredient search latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--synthetic', type=int, default=0,
+            help='Benchmark the in-memory index on N generated names '
+                 'instead of the ingredient table'
+        )
+        parser.add_argument('--queries', type=int, default=1000)
+        parser.add_argument(
+            '--limit', type=int, default=settings.INGREDIENT_SEARCH_LIMIT
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        if options['synthetic']:
+            letters = string.ascii_lowercase
+            names = [
+                ''.join(rnd.choice(letters) for _ in range(rnd.randint(4, 9)))
+                + f' {pk}'
+                for pk in range(options['synthetic'])
+            ]
+            started = time.perf_counter()
+            index = IngredientPrefixIndex(enumerate(names))
+            build_time = time.perf_counter() - started
+
+            def search(value):
+                return index.search(value, options['limit'])
+        else:
+            names = list(Ingredient.objects.values_list('name', flat=True))
+            started = time.perf_counter()
+            get_prefix_index()
+            build_time = time.perf_counter() - started
+            queryset = Ingredient.objects.all()
+
+            def search(value):
+                return list(
+                    search_ingredients(queryset, value, options['limit'])
+                )
+        if not names:
+            self.stderr.write('Nothing to search in')
+            return
+        timings = []
+        for _ in range(options['queries']):
+            name = rnd.choice(names)
+            start = rnd.randint(0, max(0, len(name) - 3))
+            value = name[start:start + rnd.randint(1, 3)]
+            started = time.perf_counter()
+            search(value)
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+            f'catalogue={len(names)} queries={len(timings)} '
+            f'index_build={build_time * 1000:.1f}ms '
+            f'p50={percentile(timings, 50):.2f}ms '
+            f'p95={percentile(timings, 95):.2f}ms '
+            f'max={max(timings):.2f}ms'
+        )
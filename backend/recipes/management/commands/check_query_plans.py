@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from recipes.plans import FILTERS, explain, fill, plan_params
+
+
+class Command(BaseCommand):
+    help = ('Prints query plans of the recipe feed for every filter '
+            'combination, on PostgreSQL fails when a plan has a Seq Scan. '
+            'recipes.tests.test_plans checks the plans on generated data, '
+            'this shows the ones of a real database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=10)
+
+    def handle(self, *args, **options):
+        found = plan_params()
+        if found is None:
+            raise CommandError(
+                'Seed the database first, plans of an empty one '
+                'tell nothing'
+            )
+        user, params = found
+        postgres = connection.vendor == 'postgresql'
+        failed = []
+        for data in FILTERS:
+            data = fill(data, params)
+            plan = explain(data, user, options['limit'])
+            self.stdout.write(self.style.MIGRATE_HEADING(str(data)))
+            self.stdout.write(plan)
+            if postgres and 'Seq Scan' in plan:
+                failed.append(data)
+        if failed:
+            raise CommandError(f'Sequential scans for filters: {failed}')
@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.parity import find_mismatches
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Renders recipes and users with the regular and the fast '
+            'serializers and fails if the json differs by a byte. '
+            'recipes.tests.test_parity checks the same on generated data, '
+            'this runs it on a real database')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', default=[],
+            help='Id of a user to render the flags for, can be repeated'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=None,
+            help='Compare only the latest N recipes'
+        )
+
+    def handle(self, *args, **options):
+        users = [AnonymousUser()] + list(
+            User.objects.filter(pk__in=options['user'])
+        )
+        mismatches = 0
+        for user in users:
+            for fast, instance, expected, actual in find_mismatches(
+                    user, options['limit']):
+                mismatches += 1
+                self.stderr.write(
+                    f'{fast.__name__} {instance.pk} '
+                    f'as {user}:\n{expected}\n{actual}'
+                )
+            self.stdout.write(f'Checked as {user}')
+        if mismatches:
+            raise CommandError(f'{mismatches} mismatches')
+        self.stdout.write(self.style.SUCCESS('Fast serializers match'))
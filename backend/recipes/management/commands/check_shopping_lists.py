@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.shopping_list import find_mismatches, rebuild
+
+
+class Command(BaseCommand):
+    help = ('Compares the stored shopping lists with the aggregation '
+            'of the carts and rebuilds the ones that differ')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report the users with a wrong list'
+        )
+
+    def handle(self, *args, **options):
+        user_ids = find_mismatches()
+        self.stdout.write(f'{len(user_ids)} shopping lists differ')
+        if not user_ids:
+            return
+        self.stdout.write(', '.join(map(str, user_ids)))
+        if options['dry_run']:
+            raise CommandError('Shopping lists are inconsistent')
+        with transaction.atomic():
+            rebuild(user_ids)
+        self.stdout.write(self.style.SUCCESS('Shopping lists rebuilt'))
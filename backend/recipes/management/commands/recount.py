@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import find_drift, recount
+
+
+class Command(BaseCommand):
+    help = ('Checks favorites, shopping and recipes counters '
+            'and repairs the ones that drifted')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report the drift'
+        )
+
+    def handle(self, *args, **options):
+        drift = find_drift()
+        for field, rows in drift.items():
+            self.stdout.write(f'{field}: {rows} rows drifted')
+        if options['dry_run'] or not any(drift.values()):
+            return
+        with transaction.atomic():
+            recount()
+        self.stdout.write(self.style.SUCCESS('Counters repaired'))
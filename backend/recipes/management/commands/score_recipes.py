@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.scoring import update_scores
+
+
+class Command(BaseCommand):
+    help = ('Recomputes popularity and trending scores of the recipes '
+            'favorited or added to a cart since the last run')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Rescore every recipe'
+        )
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Keep running and rescore every this many seconds'
+        )
+
+    def handle(self, *args, **options):
+        full = options['full']
+        while True:
+            count = update_scores(full)
+            self.stdout.write(f'Scored {count} recipes')
+            if options['interval'] <= 0:
+                return
+            full = False
+            time.sleep(options['interval'])
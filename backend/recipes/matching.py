@@ -0,0 +1,112 @@
+import heapq
+from array import array
+from collections import Counter
+from itertools import chain
+
+from recipes import journal
+from recipes.models import IngredientInRecipe
+
+
+class RecipeIngredientIndex:
+    '''
+    Inverted index from ingredient ids to the recipes using them, with
+    the ingredient ids of every recipe to score coverage and to find
+    what is missing. Postings are int arrays split by the number of
+    ingredients in the recipe, so coverage is ranked a group at a time
+    without a Python key function
+    '''
+
+    def __init__(self, rows=()):
+        self.postings = {}
+        self.recipes = {}
+        for recipe_id, ingredient_id in rows:
+            self.recipes.setdefault(recipe_id, array('l')).append(
+                ingredient_id
+            )
+        for recipe_id, ingredient_ids in self.recipes.items():
+            self.add_postings(recipe_id, ingredient_ids)
+
+    @classmethod
+    def build(cls):
+        return cls(ingredient_rows())
+
+    def __len__(self):
+        return len(self.recipes)
+
+    def add_postings(self, recipe_id, ingredient_ids):
+        size = len(ingredient_ids)
+        for ingredient_id in ingredient_ids:
+            self.postings.setdefault(ingredient_id, {}).setdefault(
+                size, array('l')
+            ).append(recipe_id)
+
+    def remove(self, recipe_id):
+        ingredient_ids = self.recipes.pop(recipe_id, ())
+        size = len(ingredient_ids)
+        for ingredient_id in ingredient_ids:
+            groups = self.postings[ingredient_id]
+            groups[size].remove(recipe_id)
+            if not groups[size]:
+                del groups[size]
+            if not groups:
+                del self.postings[ingredient_id]
+
+    def replace(self, recipe_id, ingredient_ids):
+        self.remove(recipe_id)
+        if ingredient_ids:
+            self.recipes[recipe_id] = array('l', ingredient_ids)
+            self.add_postings(recipe_id, ingredient_ids)
+
+    def refresh(self, recipe_ids):
+        ingredients = {recipe_id: [] for recipe_id in recipe_ids}
+        for recipe_id, ingredient_id in ingredient_rows(recipe_ids):
+            ingredients[recipe_id].append(ingredient_id)
+        for recipe_id, ingredient_ids in ingredients.items():
+            self.replace(recipe_id, ingredient_ids)
+
+    def top(self, ingredient_ids, limit):
+        '''
+        (recipe id, coverage, missing ingredient ids) of the limit
+        recipes with the best coverage, then the most matches, newest
+        first among equals
+        '''
+        ingredient_ids = set(ingredient_ids)
+        groups = {}
+        for ingredient_id in ingredient_ids:
+            for size, recipe_ids in self.postings.get(
+                    ingredient_id, {}).items():
+                groups.setdefault(size, []).append(recipe_ids)
+        best = []
+        for size, postings in groups.items():
+            hits = Counter(chain.from_iterable(postings))
+            best.extend(
+                (count / size, count, recipe_id)
+                for count, recipe_id in heapq.nlargest(
+                    limit, zip(hits.values(), hits.keys())
+                )
+            )
+        best.sort(reverse=True)
+        return [
+            (
+                recipe_id,
+                coverage,
+                [pk for pk in self.recipes[recipe_id]
+                 if pk not in ingredient_ids],
+            )
+            for coverage, _, recipe_id in best[:limit]
+        ]
+
+
+def ingredient_rows(recipe_ids=None):
+    rows = IngredientInRecipe.objects.order_by()
+    if recipe_ids is not None:
+        rows = rows.filter(recipe__in=recipe_ids)
+    return rows.values_list('recipe', 'ingredient').iterator()
+
+
+_index = journal.JournaledIndex(RecipeIngredientIndex)
+
+
+def match_recipes(ingredient_ids, limit):
+    with _index.synced() as index:
+        return index.top(ingredient_ids, limit)
@@ -0,0 +1,72 @@
+# Generated by Django 3.2.7 on 2026-10-18 04:20
+
+from django.conf import settings
+from django.db import migrations
+
+INGREDIENT_NAMES = (
+    'COALESCE((SELECT {} '
+    'FROM recipes_ingredientinrecipe a '
+    'JOIN recipes_ingredient i ON i.id = a.ingredient_id '
+    'WHERE a.recipe_id = r.id), \'\')'
+)
+
+
+def create_search_index(apps, schema_editor):
+    '''
+    search_vector column with a GIN index on PostgreSQL,
+    an FTS5 table with recipe ids as rowids on SQLite,
+    filled for the existing recipes
+    '''
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE recipes_recipe '
+            'ADD COLUMN IF NOT EXISTS search_vector tsvector'
+        )
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS recipe_search_vector_idx '
+            'ON recipes_recipe USING gin (search_vector)'
+        )
+        names = INGREDIENT_NAMES.format('string_agg(i.name, \' \')')
+        config = settings.RECIPE_SEARCH_CONFIG
+        schema_editor.execute(
+            'UPDATE recipes_recipe r SET search_vector = '
+            'setweight(to_tsvector(%s::regconfig, r.name), \'A\') || '
+            f'setweight(to_tsvector(%s::regconfig, {names}), \'B\') || '
+            'setweight(to_tsvector(%s::regconfig, r.text), \'C\')',
+            [config, config, config]
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts '
+            'USING fts5(name, text, ingredients, '
+            'tokenize = \'unicode61 remove_diacritics 2\')'
+        )
+        names = INGREDIENT_NAMES.format('GROUP_CONCAT(i.name, \' \')')
+        schema_editor.execute('DELETE FROM recipes_recipe_fts')
+        schema_editor.execute(
+            'INSERT INTO recipes_recipe_fts (rowid, name, text, ingredients) '
+            f'SELECT r.id, r.name, r.text, {names} FROM recipes_recipe r'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS recipe_search_vector_idx')
+        schema_editor.execute(
+            'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS recipes_recipe_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_shopping_list_items'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.7 on 2026-10-18 04:31
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_scores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe_id', models.BigIntegerField(null=True, verbose_name='recipe')),
+                ('created', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='added')),
+            ],
+            options={
+                'verbose_name': 'Recipe change',
+                'verbose_name_plural': 'Recipe changes',
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.2.7 on 2026-10-18 04:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_changes'),
+    ]
+
+    operations = [
+        # Without a scored recipe the next score_recipes run rescores
+        # all of them
+        migrations.AddField(
+            model_name='recipe',
+            name='scored',
+            field=models.DateTimeField(db_index=True, editable=False, null=True, verbose_name='scored'),
+        ),
+    ]
@@ -0,0 +1,204 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http.multipartparser import parse_header
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from recipes import cache
+from recipes.concurrency import prefetch_concurrently
+
+
+class CachedListRetrieveMixin:
+    '''
+    Serves list and retrieve from a cache of the anonymous payload,
+    per-user flags are put on top of it for every request
+    '''
+    cache_prefix = None
+    uncached_params = ()
+    filling_cache = False
+
+    def get_flags_user(self):
+        if self.filling_cache:
+            return AnonymousUser()
+        return self.request.user
+
+    def use_cache(self, request):
+        return settings.RECIPES_CACHE_ENABLED and not any(
+            param in request.query_params for param in self.uncached_params
+        )
+
+    def get_cache_version(self, request):
+        '''
+        State the payload depends on besides the cache generation
+        '''
+        return None
+
+    def cached_response(self, request, view, *args, **kwargs):
+        if not self.use_cache(request):
+            return view(request, *args, **kwargs)
+        key = cache.make_key(
+            request, self.cache_prefix, self.get_cache_version(request)
+        )
+        data = cache.load(key)
+        hit = data is not None
+        if not hit:
+            self.filling_cache = True
+            try:
+                data = view(request, *args, **kwargs).data
+            finally:
+                self.filling_cache = False
+            cache.store(key, data)
+        if isinstance(data, dict) and 'results' in data:
+            recipes = data['results']
+        elif isinstance(data, list):
+            recipes = data
+        else:
+            recipes = [data]
+        cache.overlay_user_flags(
+            recipes, request.user,
+            concurrent=getattr(self, 'concurrent_queries', False)
+        )
+        return Response(data, headers={'X-Cache': 'HIT' if hit else 'MISS'})
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, super().retrieve, *args, **kwargs
+        )
+
+
+class ConditionalGetMixin:
+    '''
+    ETag and Last-Modified from table version stamps, a matching
+    conditional request gets 304 without touching the serializer
+    '''
+    conditional_actions = ('list', 'retrieve')
+    version_models = ()
+    user_version_models = ()
+    cache_max_age = 0
+
+    def get_version_stamps(self, request):
+        models = list(self.version_models)
+        if request.user.is_authenticated:
+            models += self.user_version_models
+        return [cache.get_table_version(model) for model in models]
+
+    def get_etag(self, request, stamps):
+        raw = (
+            f'{stamps}{request.get_full_path()}{request.user.pk}'
+            f'{request.accepted_media_type}'
+        )
+        return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+    def conditional_response(self, request, view, *args, **kwargs):
+        if (not settings.RECIPES_ETAGS_ENABLED
+                or self.action not in self.conditional_actions):
+            return view(request, *args, **kwargs)
+        stamps = self.get_version_stamps(request)
+        etag = self.get_etag(request, stamps)
+        last_modified = max(stamps) // 1000
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = view(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                patch_cache_control(
+                    response, public=True, max_age=self.cache_max_age
+                )
+            patch_vary_headers(response, ('Authorization', 'Cookie'))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, super().retrieve, *args, **kwargs
+        )
+
+
+class CompactListMixin:
+    '''
+    With ?compact=1 or Accept: application/json; profile=compact
+    tags and authors of listed recipes are ids, the objects themselves
+    are side-loaded once per page in "included"
+    '''
+    compact_query_param = 'compact'
+    compact_profile = 'compact'
+
+    def is_compact(self, request):
+        if request.query_params.get(self.compact_query_param) in (
+            '1', 'true'
+        ):
+            return True
+        _, params = parse_header(
+            (request.accepted_media_type or '').encode()
+        )
+        return params.get('profile', b'').decode() == self.compact_profile
+
+    def compact(self, data):
+        recipes = data['results'] if isinstance(data, dict) else data
+        included = {'tags': {}, 'users': {}}
+        for recipe in recipes:
+            for tag in recipe['tags']:
+                included['tags'][str(tag['id'])] = tag
+            recipe['tags'] = [tag['id'] for tag in recipe['tags']]
+            author = recipe['author']
+            included['users'][str(author['id'])] = author
+            recipe['author'] = author['id']
+        if isinstance(data, dict):
+            data['included'] = included
+            return data
+        return {'results': data, 'included': included}
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200 and self.is_compact(request):
+            response.data = self.compact(response.data)
+        return response
+
+
+class ConcurrentQueriesMixin:
+    '''
+    With concurrent_queries the prefetches of the page or the object
+    run at the same time instead of one after another, the count and
+    the page rows are fetched together by the pagination
+    '''
+    concurrent_queries = False
+    prefetch_lookups = ()
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.concurrent_queries:
+            self.prefetch_lookups = queryset._prefetch_related_lookups
+            queryset = queryset.prefetch_related(None)
+        return queryset
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if self.concurrent_queries and page is not None:
+            prefetch_concurrently(page, self.prefetch_lookups)
+        return page
+
+    def get_object(self):
+        instance = super().get_object()
+        if self.concurrent_queries:
+            prefetch_concurrently([instance], self.prefetch_lookups)
+        return instance
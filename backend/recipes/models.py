@@ -1,9 +1,18 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connections, models
+from django.db.models import (
+    BooleanField, Exists, F, OuterRef, Prefetch, Subquery, Value, Window,
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import JSONObject, RowNumber
+from django.db.models.query import ModelIterable
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from recipes.validators import ColorTagValidator
+from users.models import DenormalizedFieldsMixin, Follow
 
 User = get_user_model()
 
@@ -88,10 +97,200 @@ class IngredientInRecipe(models.Model):
         ]
 
 
-class Recipe(models.Model):
+def read_prefetches():
+    '''
+    Prefetches for tags and amounts with their ingredients
+    '''
+    return (
+        Prefetch('tags', queryset=Tag.objects.all()),
+        Prefetch(
+            'amounts',
+            queryset=IngredientInRecipe.objects.select_related('ingredient')
+        ),
+    )
+
+
+def json_array(queryset, ordering, **fields):
+    '''
+    Subquery aggregating fields of the rows of queryset for the outer
+    recipe into a json array of objects, PostgreSQL only
+    '''
+    from django.contrib.postgres.aggregates import JSONBAgg
+
+    return Subquery(
+        queryset.filter(recipe=OuterRef('pk')).order_by().values(
+            'recipe'
+        ).annotate(
+            json=JSONBAgg(JSONObject(**fields), ordering=ordering)
+        ).values('json'),
+        output_field=models.JSONField()
+    )
+
+
+def json_relations():
+    '''
+    Annotations for tags and amounts with their ingredients, keys are
+    the attnames of the model fields
+    '''
+    return {
+        'tags_json': json_array(
+            Recipe.tags.through.objects.all(), 'tag__name',
+            id='tag__id', name='tag__name',
+            color='tag__color', slug='tag__slug',
+        ),
+        'amounts_json': json_array(
+            IngredientInRecipe.objects.all(), 'id',
+            id='id', ingredient_id='ingredient_id', amount='amount',
+            ingredient=JSONObject(
+                id='ingredient__id', name='ingredient__name',
+                measurement_unit='ingredient__measurement_unit',
+            ),
+        ),
+    }
+
+
+def from_json(model, db, data, **values):
+    data = {**data, **values}
+    fields = model._meta.concrete_fields
+    return model.from_db(
+        db,
+        [field.attname for field in fields],
+        [data[field.attname] for field in fields]
+    )
+
+
+def set_prefetched(instance, name, objects):
+    '''
+    Stores objects the way prefetch_related does, so instance.name.all()
+    returns them without a query
+    '''
+    queryset = getattr(instance, name).all()
+    queryset._result_cache = objects
+    queryset._prefetch_done = True
+    instance.__dict__.setdefault('_prefetched_objects_cache', {})[
+        name
+    ] = queryset
+
+
+class JSONRelationsIterable(ModelIterable):
+    '''
+    Turns the json_relations annotations into prefetched tags and
+    amounts, the serializers don't know the difference
+    '''
+
+    def __iter__(self):
+        db = self.queryset.db
+        for recipe in super().__iter__():
+            tags = recipe.__dict__.pop('tags_json') or []
+            amounts = recipe.__dict__.pop('amounts_json') or []
+            set_prefetched(recipe, 'tags', [
+                from_json(Tag, db, tag) for tag in tags
+            ])
+            recipe_amounts = []
+            for data in amounts:
+                amount = from_json(
+                    IngredientInRecipe, db, data, recipe_id=recipe.pk
+                )
+                amount.ingredient = from_json(
+                    Ingredient, db, data['ingredient']
+                )
+                amount.recipe = recipe
+                recipe_amounts.append(amount)
+            set_prefetched(recipe, 'amounts', recipe_amounts)
+            yield recipe
+
+
+class RecipeQuerySet(models.QuerySet):
+    '''
+    Read paths for recipes
+    '''
+
+    def with_user_flags(self, user):
+        '''
+        Annotate per-user flags, anonymous user gets all flags as False
+        without subqueries
+        '''
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(
+                    False, output_field=BooleanField()
+                ),
+                author_is_subscribed=Value(
+                    False, output_field=BooleanField()
+                ),
+            )
+        return self.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user.pk, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                Shopping.objects.filter(user=user.pk, recipe=OuterRef('pk'))
+            ),
+            author_is_subscribed=Exists(
+                Follow.objects.filter(
+                    user=user.pk, author=OuterRef('author')
+                )
+            ),
+        )
+
+    def with_json_relations(self):
+        '''
+        Tags and amounts come in the same row as the recipe
+        '''
+        queryset = self.annotate(**json_relations())
+        queryset._iterable_class = JSONRelationsIterable
+        return queryset
+
+    def for_read(self, user):
+        '''
+        Everything RecipeSerializer needs in a fixed number of queries:
+        one for recipes with authors, tags and amounts on PostgreSQL
+        with RECIPES_JSON_RELATIONS, plus one for tags and one for
+        amounts elsewhere
+        '''
+        queryset = self.with_user_flags(user).select_related('author')
+        if (settings.RECIPES_JSON_RELATIONS
+                and connections[self.db].vendor == 'postgresql'):
+            return queryset.with_json_relations()
+        return queryset.prefetch_related(*read_prefetches())
+
+    def latest_by_author(self, author_ids, limit):
+        '''
+        Newest recipes of every author in one query, limit applies
+        per author with ROW_NUMBER() OVER (PARTITION BY author_id)
+        '''
+        if not author_ids:
+            # An empty IN has no SQL to wrap
+            return {}
+        ranked = self.filter(author__in=author_ids).annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=[F('author')],
+                order_by=F('id').desc()
+            )
+        ).values('id', 'row_number')
+        sql, params = ranked.query.sql_with_params()
+        recipes = self.filter(pk__in=RawSQL(
+            f'SELECT ranked.id FROM ({sql}) ranked '
+            f'WHERE ranked.row_number <= %s',
+            (*params, limit)
+        )).order_by('-id')
+        recipes_by_author = {author_id: [] for author_id in author_ids}
+        for recipe in recipes:
+            recipes_by_author[recipe.author_id].append(recipe)
+        return recipes_by_author
+
+
+class Recipe(DenormalizedFieldsMixin, models.Model):
     '''
     Recipe model
     '''
+    denormalized_fields = (
+        'favorites_count', 'shopping_count', 'popularity', 'trending',
+        'scored',
+    )
+
     name = models.CharField(
         _('recipe name'), max_length=200
     )
@@ -113,17 +312,53 @@ class Recipe(models.Model):
     image = models.ImageField(
         verbose_name=_('image'), upload_to='recipes/'
     )
+    image_thumb = models.ImageField(
+        verbose_name=_('thumbnail'), upload_to='recipes/renditions/',
+        blank=True
+    )
+    image_medium = models.ImageField(
+        verbose_name=_('medium image'), upload_to='recipes/renditions/',
+        blank=True
+    )
     text = models.TextField(verbose_name=_('description'))
     cooking_time = models.PositiveSmallIntegerField(
         verbose_name=_('minutes'),
         default=1,
         validators=[MinValueValidator(1), ]
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name=_('favorites count'), default=0, editable=False
+    )
+    shopping_count = models.PositiveIntegerField(
+        verbose_name=_('shopping count'), default=0, editable=False
+    )
+    popularity = models.FloatField(
+        verbose_name=_('popularity'), default=0, editable=False
+    )
+    trending = models.FloatField(
+        verbose_name=_('trending score'), default=0, editable=False
+    )
+    scored = models.DateTimeField(
+        verbose_name=_('scored'), null=True, editable=False, db_index=True
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ['-id']
         verbose_name = _('Recipe')
         verbose_name_plural = _('Recipes')
+        indexes = [
+            models.Index(
+                fields=['author', '-id'], name='recipe_author_feed_idx'
+            ),
+            models.Index(
+                fields=['-popularity', '-id'], name='recipe_popular_idx'
+            ),
+            models.Index(
+                fields=['-trending', '-id'], name='recipe_trending_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -143,6 +378,9 @@ class Favorite(models.Model):
         on_delete=models.CASCADE,
         related_name='favorite'
     )
+    created = models.DateTimeField(
+        verbose_name=_('added'), default=timezone.now, db_index=True
+    )
 
     class Meta:
         verbose_name = _('Favorite')
@@ -169,6 +407,9 @@ class Shopping(models.Model):
         on_delete=models.CASCADE,
         related_name='shopping'
     )
+    created = models.DateTimeField(
+        verbose_name=_('added'), default=timezone.now, db_index=True
+    )
 
     class Meta:
         verbose_name = _('Shopping')
@@ -179,3 +420,51 @@ class Shopping(models.Model):
                 name='unique_shopping'
             )
         ]
+
+
+class ShoppingListItem(models.Model):
+    '''
+    Total amount of an ingredient over all recipes in the user's
+    shopping cart, kept up to date by recipes.shopping_list
+    '''
+    user = models.ForeignKey(
+        User, verbose_name=_('user'),
+        on_delete=models.CASCADE,
+        related_name='shopping_list'
+    )
+    ingredient = models.ForeignKey(
+        'Ingredient', verbose_name=_('ingredient'),
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items'
+    )
+    total_amount = models.PositiveIntegerField(
+        verbose_name=_('total amount'), default=0
+    )
+
+    class Meta:
+        verbose_name = _('Shopping list item')
+        verbose_name_plural = _('Shopping list items')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item'
+            )
+        ]
+
+
+class RecipeChange(models.Model):
+    '''
+    Journal of changed recipes read by the in-memory indexes of every
+    process, see recipes.journal. An entry without a recipe makes them
+    rebuild
+    '''
+    recipe_id = models.BigIntegerField(
+        verbose_name=_('recipe'), null=True
+    )
+    created = models.DateTimeField(
+        verbose_name=_('added'), default=timezone.now, db_index=True
+    )
+
+    class Meta:
+        verbose_name = _('Recipe change')
+        verbose_name_plural = _('Recipe changes')
@@ -1,5 +1,183 @@
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+
+from recipes.concurrency import run_concurrently
+
+
+def estimate_count(queryset):
+    '''
+    Planner row estimate on PostgreSQL, exact count elsewhere
+    '''
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']['Plan Rows']
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        return estimate_count(self.object_list)
+
+
+class ConcurrentPageMixin:
+    '''
+    Counts and fetches the page rows at the same time, the page number
+    is checked against the count afterwards
+    '''
+
+    def fetch_rows(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            return []
+        if number < 1:
+            return []
+        bottom = (number - 1) * self.per_page
+        return list(self.object_list[bottom:bottom + self.per_page])
+
+    def page(self, number):
+        _, rows = run_concurrently(
+            lambda: self.count, lambda: self.fetch_rows(number)
+        )
+        number = self.validate_number(number)
+        return self._get_page(rows, number, self)
+
+
+class ConcurrentPaginator(ConcurrentPageMixin, Paginator):
+    pass
+
+
+class EstimatedConcurrentPaginator(ConcurrentPageMixin,
+                                   EstimatedCountPaginator):
+    pass
+
+
+class IdCursorPagination(pagination.CursorPagination):
+    '''
+    Orders by -id, or keeps an order_by of the queryset that ends
+    with -id like the ones of ?ordering=popular and ?search=
+    '''
+    ordering = '-id'
+    page_size_query_param = 'limit'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = tuple(queryset.query.order_by)
+        if len(ordering) > 1 and ordering[-1] == self.ordering:
+            return ordering
+        return super().get_ordering(request, queryset, view)
+
+
+class FeedPagination(IdCursorPagination):
+    '''
+    Cursor pagination over recipe ids from
+    fetch(position, reverse, limit) instead of a queryset, the cursor
+    format and links are the ones of IdCursorPagination
+    '''
+    max_page_size = settings.RECIPE_FEED_MAX_LIMIT
+
+    def get_position(self):
+        if self.cursor is None or self.cursor.position is None:
+            return None
+        try:
+            return int(self.cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_ids(self, fetch, request):
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = (self.ordering, )
+        self.cursor = self.decode_cursor(request)
+        position = self.get_position()
+        reverse = position is not None and self.cursor.reverse
+        recipe_ids = fetch(position, reverse, self.page_size + 1)
+        self.page = recipe_ids[:self.page_size]
+        following = (
+            str(recipe_ids[-1]) if len(recipe_ids) > self.page_size
+            else None
+        )
+        current = None if position is None else str(position)
+        if reverse:
+            self.page.reverse()
+            self.next_position, self.previous_position = current, following
+        else:
+            self.next_position, self.previous_position = following, current
+        self.has_next = self.next_position is not None
+        self.has_previous = self.previous_position is not None
+        return self.page
+
+    def _get_position_from_instance(self, instance, ordering):
+        return str(instance)
 
 
 class CustomPagination(pagination.PageNumberPagination):
+    '''
+    Page numbers by default, keyset pagination on -id with
+    ?pagination=cursor (links then carry ?cursor=).
+    ?count=approx estimates the total instead of COUNT(*),
+    in cursor mode count is left out unless ?count=exact|approx is given
+    '''
     page_size_query_param = 'limit'
+    mode_query_param = 'pagination'
+    count_query_param = 'count'
+    cursor_class = IdCursorPagination
+
+    def get_count_mode(self, request):
+        return request.query_params.get(self.count_query_param)
+
+    def is_cursor_mode(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.is_cursor_mode(request):
+            self.cursor_paginator = self.cursor_class()
+            self.count = None
+            count_mode = self.get_count_mode(request)
+            if count_mode == 'exact':
+                self.count = queryset.count()
+            elif count_mode == 'approx':
+                self.count = estimate_count(queryset)
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        concurrent = getattr(view, 'concurrent_queries', False)
+        if self.get_count_mode(request) == 'approx':
+            self.django_paginator_class = (
+                EstimatedConcurrentPaginator if concurrent
+                else EstimatedCountPaginator
+            )
+        else:
+            self.django_paginator_class = (
+                ConcurrentPaginator if concurrent else Paginator
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is None:
+            return super().get_paginated_response(data)
+        content = OrderedDict()
+        if self.count is not None:
+            content['count'] = self.count
+        content['next'] = self.cursor_paginator.get_next_link()
+        content['previous'] = self.cursor_paginator.get_previous_link()
+        content['results'] = data
+        return Response(content)
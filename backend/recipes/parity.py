@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef
+from rest_framework.test import APIRequestFactory
+
+from recipes.models import Recipe
+from recipes.renderers import FastJSONRenderer
+from recipes.serializers import FastRecipeSerializer, RecipeSerializer
+from users.models import Follow
+from users.serializers import CustomUserSerializer, FastCustomUserSerializer
+
+User = get_user_model()
+
+
+def find_mismatches(user, limit=None):
+    '''
+    Renders recipes and users as user with the regular and the fast
+    serializers, yields (fast serializer, instance, regular json,
+    fast json) for every instance where the bytes differ
+    '''
+    renderer = FastJSONRenderer()
+    request = APIRequestFactory().get('/api/recipes/')
+    request.user = user
+    context = {'request': request}
+    users = User.objects.annotate(
+        is_subscribed=Exists(Follow.objects.filter(
+            user=user.pk, author=OuterRef('pk')
+        ))
+    )
+    pairs = (
+        (RecipeSerializer, FastRecipeSerializer,
+         Recipe.objects.for_read(user)[:limit]),
+        (CustomUserSerializer, FastCustomUserSerializer, users),
+    )
+    for regular, fast, queryset in pairs:
+        for instance in queryset:
+            expected = renderer.render(
+                regular(instance, context=context).data
+            )
+            actual = renderer.render(fast(instance, context=context).data)
+            if expected != actual:
+                yield fast, instance, expected, actual
@@ -0,0 +1,72 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+
+from recipes.filters import RecipeFilter
+from recipes.models import Recipe, Tag
+
+User = get_user_model()
+
+# Placeholders are filled from the data by plan_params
+FILTERS = (
+    {},
+    {'tags': ['{tag}']},
+    {'tags': ['{tag}', '{other_tag}']},
+    {'author': '{author}'},
+    {'is_favorited': 'true'},
+    {'is_in_shopping_cart': 'true'},
+    {'tags': ['{tag}'], 'author': '{author}'},
+    {'tags': ['{tag}'], 'is_favorited': 'true'},
+    {'search': '{word}'},
+    {'ordering': 'popular'},
+    {'ordering': 'trending'},
+    {'tags': ['{tag}'], 'ordering': 'trending'},
+)
+
+
+class FilterRequest:
+    def __init__(self, user):
+        self.user = user
+
+
+def plan_params():
+    '''
+    A user with favorites and values for the FILTERS placeholders,
+    None for a database without the data to fill them
+    '''
+    user = User.objects.filter(favorite__isnull=False).first()
+    tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+    recipe = Recipe.objects.values('author', 'name').first()
+    if not user or len(tags) < 2 or not recipe:
+        return None
+    words = re.findall(r'\w+', recipe['name']) or ['']
+    return user, {
+        'tag': tags[0], 'other_tag': tags[1],
+        'author': str(recipe['author']), 'word': words[0],
+    }
+
+
+def fill(data, params):
+    result = {}
+    for key, value in data.items():
+        if isinstance(value, list):
+            result[key] = [item.format(**params) for item in value]
+        else:
+            result[key] = value.format(**params)
+    return result
+
+
+def explain(data, user, limit=10):
+    '''
+    Query plan of a page of the recipe list filtered by data
+    '''
+    request = FilterRequest(
+        user if 'is_favorited' in data or 'is_in_shopping_cart' in data
+        else AnonymousUser()
+    )
+    return RecipeFilter(
+        data,
+        queryset=Recipe.objects.with_user_flags(request.user),
+        request=request
+    ).qs[:limit].explain()
@@ -0,0 +1,164 @@
+import csv
+import io
+import json
+import os
+from abc import ABCMeta, abstractmethod
+
+from django.conf import settings
+from django.http import Http404
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework import renderers
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    '''
+    JSONRenderer on top of orjson when it is installed. Indented output
+    for the browsable API and a missing orjson use the stock renderer
+    '''
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        # ListField and DictField errors are keyed by int like in json
+        return orjson.dumps(
+            data, default=self.encoder.default, option=orjson.OPT_NON_STR_KEYS
+        )
+
+
+class FormatNegotiation(DefaultContentNegotiation):
+    '''
+    Picks renderer only by ?format=, the first one is the default
+    '''
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        export_format = format_suffix or request.query_params.get(
+            api_settings.URL_FORMAT_OVERRIDE
+        )
+        for renderer in renderers:
+            if not export_format or renderer.format == export_format:
+                return renderer, renderer.media_type
+        raise Http404
+
+
+class ShoppingListRenderer(renderers.BaseRenderer, metaclass=ABCMeta):
+    '''
+    Exports aggregated shopping list rows, each row is a dict with
+    ingredient__name, ingredient__measurement_unit and amount keys.
+    The content of streaming renderers is sent as it is produced
+    '''
+    charset = 'utf-8'
+    streaming = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only error responses go through here
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+    @abstractmethod
+    def content(self, rows, title):
+        '''
+        Iterable of the bytes of the export
+        '''
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def content(self, rows, title):
+        for row in rows:
+            yield (
+                f'{row["ingredient__name"]} - {row["amount"]} '
+                f'{row["ingredient__measurement_unit"]};\n'
+            ).encode(self.charset)
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def content(self, rows, title):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            ['name', 'amount', 'measurement_unit']
+        ).encode(self.charset)
+        for row in rows:
+            yield writer.writerow([
+                row['ingredient__name'],
+                row['amount'],
+                row['ingredient__measurement_unit'],
+            ]).encode(self.charset)
+
+
+class PDFShoppingListRenderer(ShoppingListRenderer):
+    '''
+    Not streamed: pages reference the fonts and the page tree written
+    after them, reportlab lays the document out on save. The list has a
+    row per ingredient, so it stays a few pages long
+    '''
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    streaming = False
+    font_name = 'ShoppingListFont'
+    font_size = 12
+    line_height = 18
+    margin = 50
+
+    def get_font(self):
+        path = settings.SHOPPING_LIST_PDF_FONT
+        if not os.path.exists(path):
+            return 'Helvetica'
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(self.font_name, path))
+        return self.font_name
+
+    def content(self, rows, title):
+        title = str(title)
+        font = self.get_font()
+        _, height = A4
+        top = height - self.margin
+        file = io.BytesIO()
+        pdf = canvas.Canvas(file, pagesize=A4)
+        pdf.setTitle(title)
+        pdf.setFont(font, self.font_size + 4)
+        pdf.drawString(self.margin, top, title)
+        y = top - self.line_height * 2
+        pdf.setFont(font, self.font_size)
+        for row in rows:
+            if y < self.margin:
+                pdf.showPage()
+                pdf.setFont(font, self.font_size)
+                y = top
+            pdf.drawString(
+                self.margin, y,
+                f'{row["ingredient__name"]} - {row["amount"]} '
+                f'{row["ingredient__measurement_unit"]}'
+            )
+            y -= self.line_height
+        pdf.save()
+        return [file.getvalue()]
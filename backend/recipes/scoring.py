@@ -0,0 +1,133 @@
+import math
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import ExpressionWrapper, F, FloatField, Max
+from django.utils import timezone
+
+from recipes.models import Favorite, Recipe, Shopping
+
+EPOCH = datetime(2021, 1, 1, tzinfo=timezone.utc)
+# Rows committed late can carry a created before the run started
+OVERLAP = timedelta(minutes=5)
+BATCH_SIZE = 1000
+
+ORDERINGS = {
+    'popular': ('-popularity', '-id'),
+    'trending': ('-trending', '-id'),
+}
+
+
+def popularity():
+    return ExpressionWrapper(
+        F('favorites_count') * settings.RECIPE_SCORE_FAVORITE_WEIGHT
+        + F('shopping_count') * settings.RECIPE_SCORE_SHOPPING_WEIGHT,
+        output_field=FloatField()
+    )
+
+
+def events():
+    return (
+        (Favorite, settings.RECIPE_SCORE_FAVORITE_WEIGHT),
+        (Shopping, settings.RECIPE_SCORE_SHOPPING_WEIGHT),
+    )
+
+
+def trending_scores(recipe_ids):
+    '''
+    log2 of the sum of weight * 2 ** (half-lives from EPOCH to the
+    event) over favorite and shopping events of every recipe.
+    Decaying from a fixed EPOCH instead of from now keeps the scores
+    of recipes without new events comparable with fresh ones, log2
+    keeps them from overflowing as time goes on
+    '''
+    half_life = settings.RECIPE_TRENDING_HALF_LIFE
+    exponents = {recipe_id: [] for recipe_id in recipe_ids}
+    for model, weight in events():
+        if weight <= 0:
+            continue
+        offset = math.log2(weight)
+        rows = model.objects.filter(recipe__in=recipe_ids).values_list(
+            'recipe', 'created'
+        )
+        for recipe_id, created in rows.iterator():
+            exponents[recipe_id].append(
+                (created - EPOCH).total_seconds() / half_life + offset
+            )
+    scores = {}
+    for recipe_id, values in exponents.items():
+        if not values:
+            scores[recipe_id] = 0.0
+            continue
+        top = max(values)
+        scores[recipe_id] = top + math.log2(
+            sum(2 ** (value - top) for value in values)
+        )
+    return scores
+
+
+def changed_recipes(since):
+    '''
+    Recipes with events added since then, or with counters that moved
+    since popularity was computed from them, which also covers removed
+    events. Every recipe without since
+    '''
+    recipes = Recipe.objects.order_by()
+    if since is None:
+        return set(recipes.values_list('id', flat=True))
+    recipe_ids = set(recipes.exclude(
+        popularity=popularity()
+    ).values_list('id', flat=True))
+    for model, _ in events():
+        recipe_ids.update(model.objects.filter(
+            created__gte=since
+        ).values_list('recipe', flat=True))
+    return recipe_ids
+
+
+def last_scored():
+    '''
+    Start of the last run that scored a recipe. Kept on the recipes
+    rather than in the cache, so every process sees the same one
+    '''
+    return Recipe.objects.aggregate(scored=Max('scored'))['scored']
+
+
+def scores_version():
+    '''
+    Millisecond stamp of the last change of the scores
+    '''
+    scored = last_scored()
+    return int(scored.timestamp() * 1000) if scored else 0
+
+
+def score_recipes(recipe_ids, scored):
+    recipe_ids = sorted(recipe_ids)
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        batch = recipe_ids[start:start + BATCH_SIZE]
+        with transaction.atomic():
+            # Popularity first: an event removed after this update makes
+            # the counters disagree again and the recipe is rescored
+            Recipe.objects.filter(pk__in=batch).update(
+                popularity=popularity(), scored=scored
+            )
+            Recipe.objects.bulk_update(
+                [
+                    Recipe(pk=recipe_id, trending=score)
+                    for recipe_id, score in trending_scores(batch).items()
+                ],
+                ['trending']
+            )
+
+
+def update_scores(full=False):
+    '''
+    Rescores the recipes changed since the last run, all of them with
+    full or when the last run is unknown. Returns the number of recipes
+    '''
+    started = timezone.now()
+    since = None if full else last_scored()
+    recipe_ids = changed_recipes(since and since - OVERLAP)
+    score_recipes(recipe_ids, started)
+    return len(recipe_ids)
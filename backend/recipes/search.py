@@ -0,0 +1,243 @@
+import bisect
+import re
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Case, FloatField, IntegerField, Value, When
+from django.db.models.expressions import RawSQL
+
+from recipes import cache, journal
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+
+RECIPE_TABLE = Recipe._meta.db_table
+FTS_TABLE = f'{RECIPE_TABLE}_fts'
+# bm25 weights of the name, text and ingredients columns
+FTS_WEIGHTS = (10.0, 1.0, 4.0)
+MAX_SEARCH_WORDS = 10
+
+deferring = ContextVar('search_deferring', default=None)
+
+
+class IngredientPrefixIndex:
+    '''
+    In-memory index of ingredient names sorted in lower case,
+    prefix matches are found with bisect, the rest by a scan in name order
+    '''
+
+    def __init__(self, rows, version=None):
+        entries = sorted((name.lower(), pk) for pk, name in rows)
+        self.names = [name for name, _ in entries]
+        self.ids = [pk for _, pk in entries]
+        self.version = version
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, value, limit):
+        value = value.lower()
+        start = stop = bisect.bisect_left(self.names, value)
+        while stop < len(self.names) and self.names[stop].startswith(value):
+            stop += 1
+        result = self.ids[start:min(stop, start + limit)]
+        if len(result) == limit:
+            return result
+        for position, name in enumerate(self.names):
+            if start <= position < stop or value not in name:
+                continue
+            result.append(self.ids[position])
+            if len(result) == limit:
+                break
+        return result
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_prefix_index():
+    '''
+    Index is built once per process and rebuilt when the ingredient
+    table version changes
+    '''
+    global _index
+    version = cache.get_table_version(Ingredient)
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    with _index_lock:
+        if _index is None or _index.version != version:
+            _index = IngredientPrefixIndex(
+                Ingredient.objects.values_list('pk', 'name').iterator(),
+                version
+            )
+        return _index
+
+
+def search_ingredients(queryset, value, limit):
+    '''
+    Ingredients containing value, the ones starting with it go first
+    '''
+    if connection.vendor == 'postgresql':
+        # Served by the pg_trgm GIN index on UPPER(name)
+        return queryset.filter(name__icontains=value).annotate(
+            prefix_rank=Case(
+                When(name__istartswith=value, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField()
+            )
+        ).order_by('prefix_rank', 'name')[:limit]
+    ids = get_prefix_index().search(value, limit)
+    if not ids:
+        return queryset.none()
+    return queryset.filter(pk__in=ids).order_by(Case(
+        *[When(pk=pk, then=Value(position))
+          for position, pk in enumerate(ids)],
+        output_field=IntegerField()
+    ))
+
+
+def ingredient_names_sql(aggregate):
+    '''
+    Ingredient names of the recipe row r joined into one string
+    '''
+    return (
+        f'COALESCE((SELECT {aggregate} '
+        f'FROM {IngredientInRecipe._meta.db_table} a '
+        f'JOIN {Ingredient._meta.db_table} i ON i.id = a.ingredient_id '
+        f'WHERE a.recipe_id = r.id), \'\')'
+    )
+
+
+def ids_condition(recipe_ids, column='r.id'):
+    if recipe_ids is None:
+        return '', []
+    recipe_ids = list(recipe_ids)
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    return f' WHERE {column} IN ({placeholders})', recipe_ids
+
+
+@contextmanager
+def deferred():
+    '''
+    Save and delete signals of recipes and their ingredients inside
+    only collect the recipe ids. On exit they are reindexed once and
+    journaled once after the commit, for writers that touch many rows
+    of a recipe
+    '''
+    changed = set()
+    token = deferring.set(changed)
+    try:
+        yield
+    finally:
+        deferring.reset(token)
+    if changed:
+        index_recipes(sorted(changed))
+        transaction.on_commit(lambda: journal.record_change(changed))
+
+
+def defer(recipe_ids):
+    '''
+    Adds recipe_ids to the ones of the deferred() block, False outside
+    one
+    '''
+    changed = deferring.get()
+    if changed is None:
+        return False
+    changed.update(recipe_ids)
+    return True
+
+
+def index_recipes(recipe_ids=None):
+    '''
+    Rewrites the search index of recipe_ids, of all recipes with None.
+    Runs in the transaction of the change
+    '''
+    if recipe_ids is not None and not recipe_ids:
+        return
+    condition, params = ids_condition(recipe_ids)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            names = ingredient_names_sql('string_agg(i.name, \' \')')
+            config = settings.RECIPE_SEARCH_CONFIG
+            cursor.execute(
+                f'UPDATE {RECIPE_TABLE} r SET search_vector = '
+                f'setweight(to_tsvector(%s::regconfig, r.name), \'A\') || '
+                f'setweight(to_tsvector(%s::regconfig, {names}), \'B\') || '
+                f'setweight(to_tsvector(%s::regconfig, r.text), \'C\')'
+                f'{condition}',
+                [config, config, config, *params]
+            )
+        elif connection.vendor == 'sqlite':
+            names = ingredient_names_sql('GROUP_CONCAT(i.name, \' \')')
+            unindex_recipes(recipe_ids)
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, text, ingredients) '
+                f'SELECT r.id, r.name, r.text, {names} '
+                f'FROM {RECIPE_TABLE} r{condition}',
+                params
+            )
+
+
+def unindex_recipes(recipe_ids=None):
+    '''
+    Removes deleted recipes from the FTS5 table, the PostgreSQL
+    column goes away with the row
+    '''
+    if connection.vendor != 'sqlite':
+        return
+    condition, params = ids_condition(recipe_ids, 'rowid')
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}{condition}', params)
+
+
+def fts_query(value):
+    '''
+    FTS5 query matching recipes with every word of value as a prefix,
+    the closest to what websearch_to_tsquery does with stemming
+    '''
+    words = re.findall(r'\w+', value)[:MAX_SEARCH_WORDS]
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_recipes(queryset, value):
+    '''
+    Recipes matching value in the name, text or ingredient names,
+    best ranked first
+    '''
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        from django.contrib.postgres.search import (
+            SearchQuery, SearchRank, SearchVectorField,
+        )
+
+        document = RawSQL(
+            f'"{RECIPE_TABLE}"."search_vector"', (),
+            output_field=SearchVectorField()
+        )
+        query = SearchQuery(
+            value, config=settings.RECIPE_SEARCH_CONFIG,
+            search_type='websearch'
+        )
+        queryset = queryset.alias(document=document).filter(
+            document=query
+        ).annotate(search_rank=SearchRank(document, query))
+    elif vendor == 'sqlite':
+        match = fts_query(value)
+        if not match:
+            return queryset.none()
+        weights = ', '.join(map(str, FTS_WEIGHTS))
+        queryset = queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            (match, )
+        )).annotate(search_rank=RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s '
+            f'AND rowid = "{RECIPE_TABLE}"."id"',
+            (match, ), output_field=FloatField()
+        ))
+    else:
+        return queryset.filter(name__icontains=value)
+    return queryset.order_by('-search_rank', '-id')
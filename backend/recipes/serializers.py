@@ -1,16 +1,27 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
-from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from foodgram.metrics import timed_serializer
+from recipes import search, shopping_list
+from recipes.fields import RenditionField
+from recipes.images import discard_renditions, schedule_renditions
+from recipes.models import (
+    Ingredient, IngredientInRecipe, Recipe, ShoppingListItem, Tag,
+    read_prefetches,
+)
 from users.models import Follow
 from users.serializers import CustomUserSerializer
 
 User = get_user_model()
 
 
+@timed_serializer
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tag
@@ -18,6 +29,7 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'name', 'color', 'slug']
 
 
+@timed_serializer
 class IngredientSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ingredient
@@ -31,6 +43,8 @@ class AuthorRecipeSerializer(CustomUserSerializer):
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
             return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         return Follow.objects.filter(user=request.user, author=obj.pk).exists()
 
 
@@ -49,10 +63,13 @@ class IngredientsInRecipesSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'measurement_unit', 'amount']
 
 
+@timed_serializer
 class RecipeSerializer(serializers.ModelSerializer):
     is_favorited = serializers.BooleanField(read_only=True)
     is_in_shopping_cart = serializers.BooleanField(read_only=True)
     image = Base64ImageField()
+    image_thumb = RenditionField()
+    image_medium = RenditionField()
     cooking_time = serializers.IntegerField(min_value=1, read_only=True)
     tags = TagSerializer(many=True)
     author = AuthorRecipeSerializer(read_only=True)
@@ -63,31 +80,180 @@ class RecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = ['id', 'name', 'tags', 'author',
-                  'ingredients', 'image', 'text',
-                  'cooking_time', 'is_in_shopping_cart', 'is_favorited']
+                  'ingredients', 'image', 'image_thumb', 'image_medium',
+                  'text', 'cooking_time', 'is_in_shopping_cart',
+                  'is_favorited']
+
+    def to_representation(self, instance):
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
+
+
+def file_url(value, build_url):
+    if not value:
+        return None
+    return build_url(value.url)
+
+
+def make_url_builder(request):
+    '''
+    Same urls as request.build_absolute_uri, the scheme and host
+    are resolved once instead of for every image
+    '''
+    if request is None:
+        return str
+    prefix = request.build_absolute_uri('/')[:-1]
+
+    def build_url(url):
+        if (url.startswith('/') and not url.startswith('//')
+                and '/./' not in url and '/../' not in url):
+            return prefix + url
+        return request.build_absolute_uri(url)
+    return build_url
+
+
+@timed_serializer
+class FastRecipeSerializer(RecipeSerializer):
+    '''
+    Read-only RecipeSerializer for querysets from for_read, builds
+    the same dicts without going through the nested serializer fields
+    '''
+
+    @cached_property
+    def build_url(self):
+        return make_url_builder(self.context.get('request'))
+
+    @cached_property
+    def flags_user(self):
+        request = self.context.get('request')
+        if not request or not request.user.is_authenticated:
+            return None
+        return request.user
+
+    def author_is_subscribed(self, instance):
+        if self.flags_user is None:
+            return False
+        if hasattr(instance, 'author_is_subscribed'):
+            return instance.author_is_subscribed
+        return Follow.objects.filter(
+            user=self.flags_user, author=instance.author_id
+        ).exists()
+
+    def to_representation(self, instance):
+        build_url = self.build_url
+        author = instance.author
+        image = instance.image
+        data = {
+            'id': instance.id,
+            'name': instance.name,
+            'tags': [
+                {
+                    'id': tag.id,
+                    'name': tag.name,
+                    'color': tag.color,
+                    'slug': tag.slug,
+                }
+                for tag in instance.tags.all()
+            ],
+            'author': {
+                'username': author.username,
+                'first_name': author.first_name,
+                'last_name': author.last_name,
+                'id': author.id,
+                'email': author.email,
+                'is_subscribed': self.author_is_subscribed(instance),
+            },
+            'ingredients': [
+                {
+                    'id': amount.ingredient.id,
+                    'name': amount.ingredient.name,
+                    'measurement_unit': amount.ingredient.measurement_unit,
+                    'amount': amount.amount,
+                }
+                for amount in instance.amounts.all()
+            ],
+            'image': file_url(image, build_url),
+            'image_thumb': file_url(instance.image_thumb or image, build_url),
+            'image_medium': file_url(
+                instance.image_medium or image, build_url
+            ),
+            'text': instance.text,
+            'cooking_time': instance.cooking_time,
+        }
+        if hasattr(instance, 'is_in_shopping_cart'):
+            data['is_in_shopping_cart'] = bool(instance.is_in_shopping_cart)
+        if hasattr(instance, 'is_favorited'):
+            data['is_favorited'] = bool(instance.is_favorited)
+        return data
+
+
+@timed_serializer
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='ingredient.id', read_only=True)
+    name = serializers.CharField(source='ingredient.name', read_only=True)
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit', read_only=True
+    )
+    amount = serializers.IntegerField(source='total_amount', read_only=True)
+
+    class Meta:
+        model = ShoppingListItem
+        fields = ['id', 'name', 'measurement_unit', 'amount']
+
+
+class ToggleBatchSerializer(serializers.Serializer):
+    add = serializers.ListField(
+        child=serializers.IntegerField(), default=list,
+        max_length=settings.TOGGLE_BATCH_LIMIT
+    )
+    remove = serializers.ListField(
+        child=serializers.IntegerField(), default=list,
+        max_length=settings.TOGGLE_BATCH_LIMIT
+    )
+
+    def validate_add(self, value):
+        found = set(
+            Recipe.objects.filter(pk__in=value).values_list('pk', flat=True)
+        )
+        for recipe_id in value:
+            if recipe_id not in found:
+                raise serializers.ValidationError(
+                    _('Object with id={} does not exist.').format(recipe_id)
+                )
+        return value
+
+
+class RecipeMatchQuerySerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False,
+        max_length=settings.RECIPE_MATCH_MAX_INGREDIENTS
+    )
+    limit = serializers.IntegerField(
+        min_value=1, max_value=settings.RECIPE_MATCH_MAX_LIMIT,
+        default=settings.RECIPE_MATCH_LIMIT
+    )
 
 
 class IngredientsSerializer(serializers.ModelSerializer):
     amount = serializers.IntegerField()
-    id = serializers.SlugRelatedField(
-        slug_field='id', queryset=Ingredient.objects.all()
-    )
+    # Resolved to Ingredient for all items at once in validate_ingredients
+    id = serializers.IntegerField()
 
     class Meta:
         model = IngredientInRecipe
         fields = ['amount', 'id']
 
 
+@timed_serializer
 class CreateRecipeSerializer(serializers.ModelSerializer):
     image = Base64ImageField()
     cooking_time = serializers.IntegerField()
     ingredients = IngredientsSerializer(
         label='ingredients', many=True, source='amounts'
     )
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True
-    )
+    # Resolved to Tag for all items at once in validate_tags
+    tags = serializers.ListField(child=serializers.IntegerField())
 
     class Meta:
         model = Recipe
@@ -95,37 +261,89 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
                   'name', 'text', 'cooking_time']
 
     def to_representation(self, instance):
+        prefetch_related_objects([instance], *read_prefetches())
         serializer = RecipeSerializer(instance)
         return serializer.data
 
-    def tag_and_ingredient_add(self, recipe, tags, ingredients):
-        for tag in tags:
-            recipe.tags.add(tag.id)
-        for ingredient in ingredients:
-            IngredientInRecipe.objects.create(
-                recipe=recipe,
-                ingredient=ingredient['id'],
-                amount=ingredient['amount'],
+    def set_tags_and_ingredients(self, recipe, tags, ingredients,
+                                 created=False):
+        '''
+        Writes only the rows that differ from what recipe already has
+        '''
+        amounts = {
+            ingredient['id'].pk: ingredient['amount']
+            for ingredient in ingredients
+        }
+        existing = {}
+        if created:
+            recipe.tags.add(*tags)
+        else:
+            recipe.tags.set(tags)
+            existing = {
+                amount.ingredient_id: amount
+                for amount in IngredientInRecipe.objects.filter(recipe=recipe)
+            }
+        removed = existing.keys() - amounts.keys()
+        if removed:
+            IngredientInRecipe.objects.filter(
+                recipe=recipe, ingredient__in=removed
+            ).delete()
+        # Bulk writes send no signals, carts get the difference directly
+        deltas = {
+            ingredient_id: -existing[ingredient_id].amount
+            for ingredient_id in removed
+        }
+        changed = []
+        for ingredient_id, amount in existing.items():
+            new_amount = amounts.get(ingredient_id, amount.amount)
+            if amount.amount != new_amount:
+                deltas[ingredient_id] = new_amount - amount.amount
+                amount.amount = new_amount
+                changed.append(amount)
+        IngredientInRecipe.objects.bulk_update(changed, ['amount'])
+        IngredientInRecipe.objects.bulk_create([
+            IngredientInRecipe(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
             )
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in existing
+        ])
+        if not created:
+            deltas.update(
+                (ingredient_id, amount)
+                for ingredient_id, amount in amounts.items()
+                if ingredient_id not in existing
+            )
+            shopping_list.change_recipe(recipe.pk, deltas)
         return recipe
 
     @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('amounts')
         tags = validated_data.pop('tags')
-        recipe = self.Meta.model.objects.create(**validated_data)
-        return self.tag_and_ingredient_add(recipe, tags, ingredients)
+        with search.deferred():
+            recipe = self.Meta.model.objects.create(**validated_data)
+            schedule_renditions(recipe)
+            self.set_tags_and_ingredients(
+                recipe, tags, ingredients, created=True
+            )
+        return recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('amounts')
         tags = validated_data.pop('tags')
-        IngredientInRecipe.objects.filter(recipe=instance).delete()
-        instance.tags.clear()
+        if 'image' in validated_data:
+            discard_renditions(instance)
+            # Until new renditions are ready the new image is served
+            validated_data.update(image_thumb='', image_medium='')
+            schedule_renditions(instance)
         for key, value in validated_data.items():
             setattr(instance, key, value)
-        instance.save()
-        return self.tag_and_ingredient_add(instance, tags, ingredients)
+        with search.deferred():
+            instance.save()
+            self.set_tags_and_ingredients(instance, tags, ingredients)
+        return instance
 
     def validate_ingredients(self, value):
         if len(value) < 1:
@@ -145,6 +363,15 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
                     _('Amount of ingredients can\'t be less than 1')
                 )
             ingredients_id.append(ingredient_id)
+        found = Ingredient.objects.in_bulk(ingredients_id)
+        for ingredient in value:
+            if ingredient['id'] not in found:
+                raise serializers.ValidationError(
+                    _('Object with id={} does not exist.').format(
+                        ingredient['id']
+                    )
+                )
+            ingredient['id'] = found[ingredient['id']]
         return value
 
     def validate_tags(self, value):
@@ -153,14 +380,21 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
                 _('You didn\'t add any tags to recipe')
             )
         tags_id = []
-        for tag in value:
-            tag_id = tag.id
+        for tag_id in value:
             if tag_id in tags_id:
                 raise serializers.ValidationError(
                     _('Tags must not be repeated')
                 )
             tags_id.append(tag_id)
-        return value
+        found = Tag.objects.in_bulk(tags_id)
+        for tag_id in tags_id:
+            if tag_id not in found:
+                raise serializers.ValidationError(
+                    _('Invalid pk "{}" - object does not exist.').format(
+                        tag_id
+                    )
+                )
+        return [found[tag_id] for tag_id in tags_id]
 
     def validate_cooking_time(self, value):
         if value < 1:
@@ -170,8 +404,24 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         return value
 
 
+@timed_serializer
 class ShotRecipeSerializer(serializers.ModelSerializer):
+    image_thumb = RenditionField()
+
     class Meta:
         model = Recipe
-        fields = ['id', 'name', 'image', 'cooking_time']
+        fields = ['id', 'name', 'image', 'image_thumb', 'cooking_time']
         extra_kwargs = {field: {'read_only': True} for field in fields}
+
+
+@timed_serializer
+class RecipeMatchSerializer(ShotRecipeSerializer):
+    '''
+    Recipe with the share of its ingredients the user has
+    and the ones still missing
+    '''
+    coverage = serializers.FloatField(read_only=True)
+    missing = IngredientSerializer(many=True, read_only=True)
+
+    class Meta(ShotRecipeSerializer.Meta):
+        fields = ShotRecipeSerializer.Meta.fields + ['coverage', 'missing']
@@ -0,0 +1,124 @@
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from recipes.models import IngredientInRecipe, Shopping, ShoppingListItem
+
+
+def apply_deltas(user_ids, deltas):
+    '''
+    Adds {ingredient_id: delta} to the shopping lists of all user_ids,
+    three statements whatever the number of users and ingredients.
+    Totals never go below zero, emptied items are removed
+    '''
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+    if not user_ids or not deltas:
+        return
+    ShoppingListItem.objects.bulk_create(
+        [
+            ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id)
+            for user_id in user_ids
+            for ingredient_id, delta in deltas.items() if delta > 0
+        ],
+        ignore_conflicts=True
+    )
+    items = ShoppingListItem.objects.filter(
+        user__in=user_ids, ingredient__in=list(deltas)
+    )
+    items.update(total_amount=Greatest(
+        F('total_amount') + Case(
+            *(
+                When(ingredient=ingredient_id, then=Value(delta))
+                for ingredient_id, delta in deltas.items()
+            ),
+            output_field=IntegerField()
+        ),
+        Value(0)
+    ))
+    if any(delta < 0 for delta in deltas.values()):
+        items.filter(total_amount=0).delete()
+
+
+def recipe_amounts(recipe_ids, sign=1):
+    '''
+    Amount of every ingredient summed over recipe_ids
+    '''
+    return {
+        ingredient_id: sign * total
+        for ingredient_id, total in IngredientInRecipe.objects.filter(
+            recipe__in=recipe_ids
+        ).values_list('ingredient').annotate(
+            total=Sum('amount')
+        ).order_by()
+    }
+
+
+def add_recipes(user_id, recipe_ids):
+    apply_deltas([user_id], recipe_amounts(recipe_ids))
+
+
+def remove_recipes(user_id, recipe_ids):
+    apply_deltas([user_id], recipe_amounts(recipe_ids, sign=-1))
+
+
+def change_recipe(recipe_id, deltas):
+    '''
+    Ingredient amounts of a recipe changed by deltas, applied to the
+    lists of everyone who has it in the cart
+    '''
+    user_ids = list(
+        Shopping.objects.filter(recipe=recipe_id).values_list(
+            'user', flat=True
+        )
+    )
+    apply_deltas(user_ids, deltas)
+
+
+def live_totals(user_ids=None):
+    '''
+    The shopping lists aggregated from carts the way they used to be
+    '''
+    # One filter() call, so both conditions use the same cart join
+    filters = {'recipe__shopping__isnull': False}
+    if user_ids is not None:
+        filters['recipe__shopping__user__in'] = user_ids
+    return IngredientInRecipe.objects.filter(**filters).values_list(
+        'recipe__shopping__user', 'ingredient'
+    ).annotate(total=Sum('amount')).order_by()
+
+
+def find_mismatches():
+    '''
+    Ids of users whose stored list differs from the live aggregation
+    '''
+    live = {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in live_totals()
+    }
+    stored = {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in
+        ShoppingListItem.objects.values_list(
+            'user', 'ingredient', 'total_amount'
+        )
+    }
+    return sorted({
+        user_id for user_id, ingredient_id in live.keys() | stored.keys()
+        if live.get((user_id, ingredient_id))
+        != stored.get((user_id, ingredient_id))
+    })
+
+
+def rebuild(user_ids):
+    '''
+    Replaces the stored lists of user_ids with the live aggregation
+    '''
+    ShoppingListItem.objects.filter(user__in=user_ids).delete()
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(
+            user_id=user_id, ingredient_id=ingredient_id, total_amount=total
+        )
+        for user_id, ingredient_id, total in live_totals(user_ids)
+    )
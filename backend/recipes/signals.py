@@ -0,0 +1,149 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete,
+)
+from django.dispatch import receiver
+
+from recipes import cache, journal, search, shopping_list
+from recipes.counters import change_counter
+from recipes.models import (
+    Favorite, Ingredient, IngredientInRecipe, Recipe, Shopping, Tag,
+)
+from users.models import Follow
+
+User = get_user_model()
+
+VERSIONED_MODELS = (
+    Recipe, IngredientInRecipe, Ingredient, Tag, Favorite, Shopping, Follow,
+)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_cache(sender, **kwargs):
+    # After commit, or a concurrent read could cache the old rows again
+    transaction.on_commit(cache.bump_generation)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_recipe_cache_on_author_change(sender, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(cache.bump_generation)
+    transaction.on_commit(lambda: cache.touch_table(User))
+
+
+@receiver(post_save, sender=Favorite)
+def count_favorite_added(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def count_favorite_removed(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=Shopping)
+def count_shopping_added(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'shopping_count', 1)
+
+
+@receiver(post_delete, sender=Shopping)
+def count_shopping_removed(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'shopping_count', -1)
+
+
+@receiver(post_save, sender=Shopping)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        shopping_list.add_recipes(instance.user_id, [instance.recipe_id])
+
+
+# Before the delete: when the recipe itself is deleted its amounts
+# are already gone by post_delete of the cascaded cart rows
+@receiver(pre_delete, sender=Shopping)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    shopping_list.remove_recipes(instance.user_id, [instance.recipe_id])
+
+
+@receiver(post_save, sender=Recipe)
+def count_recipe_added(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def count_recipe_removed(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, update_fields=None, **kwargs):
+    if search.defer([instance.pk]):
+        return
+    if update_fields and not {'name', 'text'} & set(update_fields):
+        return
+    search.index_recipes([instance.pk])
+
+
+@receiver(post_save, sender=Recipe)
+def journal_recipe(sender, instance, update_fields=None, **kwargs):
+    # Ingredients written in bulk later in the same transaction are
+    # read when the journal is applied, after the commit
+    if update_fields and 'author' not in update_fields:
+        return
+    if not search.defer([instance.pk]):
+        journal.record_change([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    if search.defer([instance.pk]):
+        return
+    search.unindex_recipes([instance.pk])
+    journal.record_change([instance.pk])
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def index_recipe_ingredients(sender, instance, **kwargs):
+    if search.defer([instance.recipe_id]):
+        return
+    search.index_recipes([instance.recipe_id])
+    journal.record_change([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def index_ingredient_recipes(sender, instance, created, **kwargs):
+    if not created:
+        recipe_ids = list(IngredientInRecipe.objects.filter(
+            ingredient=instance
+        ).values_list('recipe', flat=True))
+        if not search.defer(recipe_ids):
+            search.index_recipes(recipe_ids)
+
+
+def touch_table(sender, **kwargs):
+    transaction.on_commit(lambda: cache.touch_table(sender))
+
+
+def touch_recipe_table(sender, **kwargs):
+    transaction.on_commit(lambda: cache.touch_table(Recipe))
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(touch_table, sender=model)
+    post_delete.connect(touch_table, sender=model)
+m2m_changed.connect(touch_recipe_table, sender=Recipe.tags.through)
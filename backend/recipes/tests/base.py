@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.benchmark import Seeder
+
+User = get_user_model()
+
+VOLUMES = {
+    'users': 15,
+    'tags': 5,
+    'ingredients': 50,
+    'recipes': 40,
+    'per_recipe': 6,
+    'favorites': 5,
+    'cart': 3,
+    'follows': 5,
+    'feed_follows': 10,
+}
+
+
+class SeededAPITestCase(TestCase):
+    '''
+    Small generated dataset, a client authenticated as a user who has
+    favorites, a cart and subscriptions, and a cold recipes cache
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        Seeder().seed(VOLUMES)
+        cls.user = User.objects.order_by('pk').first()
+        cls.token = Token.objects.get(user=cls.user).key
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
@@ -0,0 +1,70 @@
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+
+from recipes import toggles
+from recipes.benchmark import image_base64
+from recipes.models import Recipe, Tag
+from recipes.serializers import CreateRecipeSerializer
+from recipes.tests.base import SeededAPITestCase
+
+User = get_user_model()
+
+
+class CounterTests(SeededAPITestCase):
+    '''
+    Saving an instance loaded before a concurrent favorite, cart add
+    or new recipe keeps the counters that were changed in the meantime
+    '''
+
+    def fan(self, recipe):
+        return User.objects.exclude(pk=recipe.author_id).exclude(
+            favorite__recipe=recipe
+        ).exclude(shopping__recipe=recipe).first()
+
+    def test_recipe_save_keeps_concurrent_counters(self):
+        stale = Recipe.objects.get(pk=Recipe.objects.first().pk)
+        fan = self.fan(stale)
+        toggles.favorites.add(fan, [stale.pk])
+        toggles.shopping_cart.add(fan, [stale.pk])
+        stale.name = 'Renamed'
+        stale.save()
+        recipe = Recipe.objects.get(pk=stale.pk)
+        self.assertEqual(recipe.name, 'Renamed')
+        self.assertEqual(recipe.favorites_count, stale.favorites_count + 1)
+        self.assertEqual(recipe.shopping_count, stale.shopping_count + 1)
+
+    def test_recipe_edit_keeps_concurrent_favorite(self):
+        stale = Recipe.objects.get(pk=Recipe.objects.first().pk)
+        toggles.favorites.add(self.fan(stale), [stale.pk])
+        serializer = CreateRecipeSerializer(stale, data={
+            'name': 'Edited',
+            'text': 'Edited recipe',
+            'cooking_time': 10,
+            'image': image_base64(),
+            'tags': [Tag.objects.first().pk],
+            'ingredients': [
+                {'id': amount.ingredient_id, 'amount': 1}
+                for amount in stale.amounts.all()
+            ],
+        })
+        serializer.is_valid(raise_exception=True)
+        with tempfile.TemporaryDirectory() as media_root:
+            with override_settings(MEDIA_ROOT=media_root):
+                serializer.save()
+        recipe = Recipe.objects.get(pk=stale.pk)
+        self.assertEqual(recipe.name, 'Edited')
+        self.assertEqual(recipe.favorites_count, stale.favorites_count + 1)
+
+    def test_user_save_keeps_concurrent_recipes_count(self):
+        stale = User.objects.get(pk=self.user.pk)
+        Recipe.objects.create(
+            author=self.user, name='New', text='New recipe',
+            image='recipes/new.png'
+        )
+        stale.set_password('changed')
+        stale.save()
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(user.check_password('changed'))
+        self.assertEqual(user.recipes_count, stale.recipes_count + 1)
@@ -0,0 +1,24 @@
+from django.test import override_settings
+
+from recipes.models import Recipe
+from recipes.tests.base import SeededAPITestCase
+
+
+class ETagTests(SeededAPITestCase):
+    '''
+    Version stamps in a per-process cache would answer 304 for rows
+    changed by another worker, ETags are off without a shared cache
+    '''
+
+    def test_not_modified(self):
+        path = f'/api/recipes/{Recipe.objects.first().pk}/'
+        etag = self.client.get(path)['ETag']
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(RECIPES_ETAGS_ENABLED=False)
+    def test_disabled(self):
+        path = f'/api/recipes/{Recipe.objects.first().pk}/'
+        response = self.client.get(path, HTTP_IF_NONE_MATCH='"any"')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
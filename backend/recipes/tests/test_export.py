@@ -0,0 +1,32 @@
+from recipes.models import ShoppingListItem
+from recipes.renderers import ShoppingListRenderer
+from recipes.tests.base import SeededAPITestCase
+
+PATH = '/api/recipes/download_shopping_cart/'
+
+
+class ShoppingListExportTests(SeededAPITestCase):
+
+    def test_text_and_csv_are_streamed(self):
+        items = ShoppingListItem.objects.filter(user=self.user).count()
+        self.assertGreater(items, 0)
+        for export_format, lines in (('txt', items), ('csv', items + 1)):
+            with self.subTest(format=export_format):
+                response = self.client.get(f'{PATH}?format={export_format}')
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.streaming)
+                content = b''.join(response.streaming_content)
+                self.assertEqual(len(content.decode().splitlines()), lines)
+
+    def test_pdf_is_sent_whole(self):
+        response = self.client.get(f'{PATH}?format=pdf')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.streaming)
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        self.assertEqual(
+            int(response['Content-Length']), len(response.content)
+        )
+
+    def test_renderer_needs_content(self):
+        with self.assertRaises(TypeError):
+            ShoppingListRenderer()
@@ -0,0 +1,59 @@
+from contextlib import contextmanager
+from unittest import mock
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import override_settings
+
+from recipes import cache, feed, journal
+from recipes.models import Recipe
+from recipes.tests.base import SeededAPITestCase
+from users.models import Follow
+
+
+@override_settings(RECIPES_CACHE_ENABLED=False)
+class FeedTests(SeededAPITestCase):
+    '''
+    Recipes written by another process reach the feed index of this
+    one through the database journal, with nothing shared in the cache
+    '''
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(
+            feed, '_index', journal.JournaledIndex(feed.AuthorRecipeIndex)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.author = Follow.objects.filter(user=self.user).first().author
+
+    @contextmanager
+    def other_process(self):
+        # A cache of its own, like locmem in another worker
+        with mock.patch.object(
+            cache, 'get_cache', return_value=LocMemCache('other', {})
+        ), self.captureOnCommitCallbacks(execute=True):
+            yield
+
+    def feed_ids(self):
+        response = self.client.get('/api/recipes/feed/?limit=5')
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_new_and_deleted_recipes(self):
+        before = self.feed_ids()
+        with self.other_process():
+            recipe = Recipe.objects.create(
+                author=self.author, name='New', text='New recipe',
+                image='recipes/new.png'
+            )
+        self.assertEqual(self.feed_ids(), [recipe.pk, *before[:4]])
+        with self.other_process():
+            recipe.delete()
+        self.assertEqual(self.feed_ids(), before)
+
+    def test_unfollowed_author(self):
+        recipe = Recipe.objects.create(
+            author=self.author, name='New', text='New recipe',
+            image='recipes/new.png'
+        )
+        Follow.objects.filter(user=self.user, author=self.author).delete()
+        self.assertNotIn(recipe.pk, self.feed_ids())
@@ -0,0 +1,70 @@
+import tempfile
+from io import StringIO
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import override_settings
+
+from recipes.benchmark import image_base64
+from recipes.models import Recipe, Tag
+from recipes.tests.base import SeededAPITestCase
+
+
+class RenditionTests(SeededAPITestCase):
+    '''
+    Renditions are made inline in tests, like IMAGE_RENDITIONS_ASYNC=False
+    '''
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media = override_settings(MEDIA_ROOT=media_root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        recipe = Recipe.objects.filter(author=self.user).first()
+        self.path = f'/api/recipes/{recipe.pk}/'
+        self.data = {
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'tags': [Tag.objects.first().pk],
+            'ingredients': [
+                {'id': amount.ingredient_id, 'amount': amount.amount}
+                for amount in recipe.amounts.all()
+            ],
+        }
+
+    def upload(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                self.path, {**self.data, 'image': image_base64()},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        return Recipe.objects.get(pk=response.data['id'])
+
+    def test_replaced_renditions_are_deleted(self):
+        first = self.upload()
+        names = [first.image_thumb.name, first.image_medium.name]
+        for name in names:
+            self.assertTrue(default_storage.exists(name), name)
+        second = self.upload()
+        self.assertNotEqual(second.image_thumb.name, names[0])
+        self.assertTrue(default_storage.exists(second.image_thumb.name))
+        for name in names:
+            self.assertFalse(default_storage.exists(name), name)
+
+    def test_command_makes_missing_renditions(self):
+        recipe = self.upload()
+        thumb = recipe.image_thumb.name
+        # Seeded images have no files
+        Recipe.objects.exclude(pk=recipe.pk).update(
+            image_thumb='seeded', image_medium='seeded'
+        )
+        Recipe.objects.filter(pk=recipe.pk).update(image_medium='')
+        call_command('make_image_renditions', stdout=StringIO())
+        recipe.refresh_from_db()
+        self.assertTrue(default_storage.exists(recipe.image_medium.name))
+        self.assertTrue(default_storage.exists(recipe.image_thumb.name))
+        self.assertFalse(default_storage.exists(thumb))
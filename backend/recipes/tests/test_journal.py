@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Max
+
+from recipes import journal
+from recipes.matching import RecipeIngredientIndex
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, RecipeChange
+from recipes.tests.base import SeededAPITestCase
+
+
+class JournalTests(SeededAPITestCase):
+    '''
+    Indexes of two processes that share only the database
+    '''
+
+    def setUp(self):
+        super().setUp()
+        self.writer = journal.JournaledIndex(RecipeIngredientIndex)
+        self.reader = journal.JournaledIndex(RecipeIngredientIndex)
+        for index in (self.writer, self.reader):
+            with index.synced():
+                pass
+        self.recipe = Recipe.objects.first()
+
+    def latest(self):
+        return RecipeChange.objects.aggregate(latest=Max('id'))['latest']
+
+    def test_change_reaches_other_process(self):
+        ingredient = Ingredient.objects.create(
+            name='Sumac', measurement_unit='g'
+        )
+        IngredientInRecipe.objects.create(
+            recipe=self.recipe, ingredient=ingredient, amount=1
+        )
+        # Nothing goes through the cache
+        cache.clear()
+        built = self.reader.index
+        with self.reader.synced() as index:
+            self.assertIs(index, built)
+            self.assertIn(ingredient.pk, index.recipes[self.recipe.pk])
+        self.assertEqual(self.reader.sequence, self.latest())
+
+    def test_gap_is_waited_for(self):
+        journal.record_change([self.recipe.pk])
+        with self.reader.synced():
+            pass
+        position = self.latest()
+        self.assertEqual(self.reader.sequence, position)
+        change = RecipeChange.objects.create(
+            id=position + 2, recipe_id=self.recipe.pk
+        )
+        with self.reader.synced():
+            pass
+        self.assertEqual(self.reader.sequence, position)
+        change.created -= journal.SETTLE
+        change.save()
+        with self.reader.synced():
+            pass
+        self.assertEqual(self.reader.sequence, position + 2)
+
+    def test_reset_rebuilds_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            journal.reset()
+        built = self.reader.index
+        with self.reader.synced() as index:
+            self.assertIsNot(index, built)
+        with self.reader.synced() as rebuilt:
+            self.assertIs(rebuilt, index)
+
+    def test_stale_index_rebuilds(self):
+        self.reader.synced_at -= journal.retention() + timedelta(seconds=1)
+        built = self.reader.index
+        with self.reader.synced() as index:
+            self.assertIsNot(index, built)
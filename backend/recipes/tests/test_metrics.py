@@ -0,0 +1,33 @@
+from django.test import override_settings
+
+from recipes.tests.base import SeededAPITestCase
+
+PROMETHEUS_ACCEPT = (
+    'application/openmetrics-text;version=1.0.0;q=0.5,'
+    'text/plain;version=0.0.4;q=0.4,*/*;q=0.1'
+)
+
+
+@override_settings(PERFORMANCE_SAMPLE_RATE=1)
+class MetricsTests(SeededAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user.is_staff = True
+        self.user.save()
+
+    def test_exposition_content_type(self):
+        for accept in (None, PROMETHEUS_ACCEPT, 'text/plain', '*/*'):
+            with self.subTest(accept=accept):
+                headers = {'HTTP_ACCEPT': accept} if accept else {}
+                response = self.client.get('/api/metrics/', **headers)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    response['Content-Type'],
+                    'text/plain; version=0.0.4; charset=utf-8'
+                )
+                self.assertIn(b'# TYPE', response.content)
+
+    def test_json(self):
+        response = self.client.get('/api/metrics/?format=json')
+        self.assertEqual(response['Content-Type'], 'application/json')
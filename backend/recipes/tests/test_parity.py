@@ -0,0 +1,50 @@
+from django.contrib.auth.models import AnonymousUser
+from django.test import override_settings
+
+from recipes.models import Recipe
+from recipes.parity import find_mismatches
+from recipes.tests.base import SeededAPITestCase
+
+
+class SerializerParityTests(SeededAPITestCase):
+    '''
+    Fast serializers render the same bytes as the regular ones
+    '''
+
+    def assertParity(self, user):
+        mismatches = [
+            f'{fast.__name__} {instance.pk}:\n{expected}\n{actual}'
+            for fast, instance, expected, actual in find_mismatches(user)
+        ]
+        self.assertEqual(mismatches, [])
+
+    def test_anonymous(self):
+        self.assertParity(AnonymousUser())
+
+    def test_user_with_flags(self):
+        # The seeded user has favorites, a cart and subscriptions
+        self.assertParity(self.user)
+
+    def test_renditions_and_empty_text(self):
+        Recipe.objects.filter(pk=Recipe.objects.first().pk).update(
+            image_thumb='recipes/renditions/thumb.webp',
+            image_medium='recipes/renditions/medium.webp',
+            text='',
+        )
+        self.assertParity(self.user)
+
+    # On PostgreSQL the default is the json aggregate path
+    @override_settings(RECIPES_JSON_RELATIONS=False)
+    def test_prefetched_relations(self):
+        self.assertParity(self.user)
+
+    def test_api_list(self):
+        responses = {}
+        for fast in (False, True):
+            with override_settings(
+                FAST_SERIALIZERS=fast, RECIPES_CACHE_ENABLED=False
+            ):
+                responses[fast] = self.client.get(
+                    '/api/recipes/?limit=40'
+                ).content
+        self.assertEqual(responses[False], responses[True])
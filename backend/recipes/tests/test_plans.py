@@ -0,0 +1,60 @@
+import re
+from unittest import skipUnless
+
+from django.db import connection
+
+from recipes.plans import FILTERS, explain, fill, plan_params
+from recipes.tests.base import SeededAPITestCase
+
+# Index each filter has to go through, as SQLite names it in the plan
+SQLITE_INDEXES = {
+    'tags': 'recipe_tags_tag_recipe_idx',
+    'author': 'SEARCH recipes_recipe USING INDEX',
+    'is_favorited': 'SEARCH recipes_favorite USING COVERING INDEX',
+    'is_in_shopping_cart': 'SEARCH recipes_shopping USING COVERING INDEX',
+    'search': 'recipes_recipe_fts VIRTUAL TABLE INDEX',
+}
+SQLITE_ORDERINGS = {
+    'popular': 'recipe_popular_idx',
+    'trending': 'recipe_trending_idx',
+}
+# A table read row by row without an index
+FULL_SCAN = re.compile(r'\bSCAN \w+$', re.MULTILINE)
+
+
+class QueryPlanTests(SeededAPITestCase):
+    '''
+    Every filter combination of the recipe list is served by indexes.
+    Plan text is backend specific, other backends skip these
+    '''
+
+    def plans(self):
+        user, params = plan_params()
+        for data in FILTERS:
+            data = fill(data, params)
+            yield data, explain(data, user)
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite plans')
+    def test_sqlite_plans(self):
+        for data, plan in self.plans():
+            with self.subTest(data=data):
+                if data:
+                    self.assertIsNone(FULL_SCAN.search(plan), plan)
+                if len(data) != 1:
+                    # The planner picks which of the indexes to drive by
+                    continue
+                name, value = next(iter(data.items()))
+                if name == 'ordering':
+                    self.assertIn(SQLITE_ORDERINGS[value], plan)
+                else:
+                    self.assertIn(SQLITE_INDEXES[name], plan)
+
+    @skipUnless(connection.vendor == 'postgresql', 'PostgreSQL plans')
+    def test_postgresql_plans(self):
+        # The dataset is small enough for a Seq Scan to win anyway,
+        # with them disabled one still shows up if no index fits
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        for data, plan in self.plans():
+            with self.subTest(data=data):
+                self.assertNotIn('Seq Scan', plan)
@@ -0,0 +1,61 @@
+from django.test import override_settings
+
+from recipes.models import Recipe
+from recipes.tests.base import SeededAPITestCase
+
+
+@override_settings(RECIPES_CACHE_ENABLED=False)
+class ReadQueryCountTests(SeededAPITestCase):
+    '''
+    Pages cost a fixed number of queries whatever their size.
+    Authenticated requests start with the token lookup
+    '''
+
+    def test_recipe_list(self):
+        # Count, page with authors and flags, tags, amounts
+        for limit in (1, 10, 40):
+            with self.subTest(limit=limit), self.assertNumQueries(5):
+                response = self.client.get(f'/api/recipes/?limit={limit}')
+            self.assertEqual(len(response.data['results']), limit)
+
+    def test_recipe_list_anonymous(self):
+        self.client.credentials()
+        with self.assertNumQueries(4):
+            self.client.get('/api/recipes/?limit=40')
+
+    def test_recipe_list_filtered(self):
+        for params, queries in (
+            ('is_favorited=true', 5),
+            ('is_in_shopping_cart=true', 5),
+            # The author filter looks the author up
+            (f'author={self.user.pk}', 6),
+            ('ordering=popular', 5),
+        ):
+            with self.subTest(params=params), self.assertNumQueries(queries):
+                response = self.client.get(f'/api/recipes/?{params}')
+            if not params.startswith('ordering'):
+                # A filter that is silently dropped lists every recipe
+                self.assertLess(
+                    response.data['count'], Recipe.objects.count(), params
+                )
+
+    def test_recipe_detail(self):
+        recipe = Recipe.objects.first()
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/recipes/{recipe.pk}/')
+        self.assertEqual(response.data['id'], recipe.pk)
+
+    def test_subscriptions(self):
+        # Count, authors, latest recipes of all of them
+        for limit in (1, 5):
+            with self.subTest(limit=limit), self.assertNumQueries(4):
+                response = self.client.get(
+                    f'/api/users/subscriptions/?limit={limit}'
+                )
+            self.assertEqual(len(response.data['results']), limit)
+
+    def test_user_list(self):
+        for limit in (1, 10):
+            with self.subTest(limit=limit), self.assertNumQueries(3):
+                response = self.client.get(f'/api/users/?limit={limit}')
+            self.assertEqual(len(response.data['results']), limit)
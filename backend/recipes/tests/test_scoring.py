@@ -0,0 +1,59 @@
+from datetime import timedelta
+from unittest import mock
+from uuid import uuid4
+
+from django.contrib.auth import get_user_model
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import F
+from django.test import override_settings
+
+from recipes import cache, scoring, toggles
+from recipes.models import Recipe
+from recipes.tests.base import SeededAPITestCase
+
+User = get_user_model()
+
+
+@override_settings(RECIPES_CACHE_ENABLED=True)
+class ScoringTests(SeededAPITestCase):
+    '''
+    score_recipes runs in a process of its own, with locmem it shares
+    nothing but the database with the web workers
+    '''
+
+    def score(self, full=False):
+        # A run from cron, with a new process every time
+        store = LocMemCache(f'scoring-{uuid4().hex}', {})
+        self.addCleanup(store.clear)
+        with mock.patch.object(cache, 'get_cache', return_value=store):
+            return scoring.update_scores(full)
+
+    def setUp(self):
+        super().setUp()
+        # Seeded events come before the runs of the tests
+        for model, _ in scoring.events():
+            model.objects.update(created=F('created') - timedelta(days=1))
+
+    def test_rescores_only_changed_recipes(self):
+        self.assertEqual(self.score(full=True), Recipe.objects.count())
+        recipe = Recipe.objects.first()
+        fan = User.objects.exclude(favorite__recipe=recipe).first()
+        toggles.favorites.add(fan, [recipe.pk])
+        self.assertEqual(self.score(), 1)
+        # Still within OVERLAP of the last run
+        self.assertEqual(self.score(), 1)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.scored, scoring.last_scored())
+
+    def test_new_scores_reach_cached_pages(self):
+        self.score(full=True)
+        url = '/api/recipes/?ordering=popular&limit=1'
+        first = self.client.get(url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        recipe = Recipe.objects.order_by('popularity', 'id').first()
+        Recipe.objects.filter(pk=recipe.pk).update(favorites_count=1000)
+        self.score()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['id'], recipe.pk)
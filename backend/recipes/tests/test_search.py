@@ -0,0 +1,97 @@
+import tempfile
+from unittest import mock
+
+from django.db.models import Max
+from django.test import override_settings
+
+from recipes import journal, search
+from recipes.benchmark import image_base64
+from recipes.models import Ingredient, Recipe, RecipeChange, Tag
+from recipes.tests.base import SeededAPITestCase
+
+
+class RecipeWriteIndexTests(SeededAPITestCase):
+    '''
+    Creating, editing or deleting a recipe through the API reindexes
+    and journals it once, after its ingredients are written
+    '''
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media = override_settings(MEDIA_ROOT=media_root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.ingredient = Ingredient.objects.create(
+            name='Tamarind', measurement_unit='g'
+        )
+        # The first prune of the process is not counted
+        journal.prune()
+        self.journaled = RecipeChange.objects.aggregate(
+            journaled=Max('id')
+        )['journaled'] or 0
+
+    def data(self, name):
+        return {
+            'name': name,
+            'text': 'Sour and sweet',
+            'cooking_time': 10,
+            'image': image_base64(),
+            'tags': [Tag.objects.first().pk],
+            'ingredients': [{'id': self.ingredient.pk, 'amount': 5}],
+        }
+
+    def write(self, method, url, data):
+        with mock.patch.object(
+            search, 'index_recipes', wraps=search.index_recipes
+        ) as index_recipes:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = getattr(self.client, method)(
+                    url, data, format='json'
+                )
+        self.assertLess(response.status_code, 300, response.data)
+        recipe_id = response.data['id']
+        index_recipes.assert_called_once_with([recipe_id])
+        self.assertJournaledOnce(recipe_id)
+        return recipe_id
+
+    def assertJournaledOnce(self, recipe_id):
+        self.assertEqual(
+            list(RecipeChange.objects.filter(
+                id__gt=self.journaled
+            ).values_list('recipe_id', flat=True)),
+            [recipe_id]
+        )
+
+    def found(self, query):
+        return set(Recipe.objects.filter(
+            pk__in=search.search_recipes(Recipe.objects.all(), query)
+        ).values_list('id', flat=True))
+
+    def test_create(self):
+        recipe_id = self.write('post', '/api/recipes/', self.data('Chutney'))
+        self.assertIn(recipe_id, self.found('chutney'))
+        self.assertIn(recipe_id, self.found('tamarind'))
+
+    def test_update(self):
+        recipe = Recipe.objects.filter(author=self.user).first()
+        self.write(
+            'patch', f'/api/recipes/{recipe.pk}/', self.data('Relish')
+        )
+        self.assertIn(recipe.pk, self.found('relish'))
+        self.assertIn(recipe.pk, self.found('tamarind'))
+
+    def test_delete(self):
+        recipe = Recipe.objects.filter(author=self.user).first()
+        self.assertGreater(recipe.amounts.count(), 1)
+        # Counters and shopping lists go per favorite and cart row, the
+        # amounts take one delete, the index two and the journal one
+        with self.assertNumQueries(26), mock.patch.object(
+            search, 'index_recipes', wraps=search.index_recipes
+        ) as index_recipes, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/recipes/{recipe.pk}/')
+        self.assertEqual(response.status_code, 204)
+        index_recipes.assert_called_once_with([recipe.pk])
+        self.assertJournaledOnce(recipe.pk)
+        self.assertNotIn(recipe.pk, self.found(recipe.name))
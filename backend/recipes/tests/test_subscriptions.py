@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+
+from recipes.tests.base import SeededAPITestCase
+from users.models import Follow
+
+User = get_user_model()
+
+
+class SubscriptionTests(SeededAPITestCase):
+
+    def test_no_follows(self):
+        Follow.objects.filter(user=self.user).delete()
+        response = self.client.get('/api/users/subscriptions/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+
+    def test_invalid_recipes_limit_stores_no_follow(self):
+        author = User.objects.exclude(pk=self.user.pk).exclude(
+            following__user=self.user
+        ).first()
+        path = f'/api/users/{author.pk}/subscribe/'
+        response = self.client.get(f'{path}?recipes_limit=abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(
+            Follow.objects.filter(user=self.user, author=author).exists()
+        )
+        self.assertEqual(self.client.get(path).status_code, 201)
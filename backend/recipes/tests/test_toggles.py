@@ -0,0 +1,33 @@
+from recipes.models import Favorite, Recipe
+from recipes.tests.base import SeededAPITestCase
+
+
+class ToggleTests(SeededAPITestCase):
+
+    def test_non_numeric_pk_is_not_found(self):
+        for method, path in (
+            ('get', '/api/recipes/abc/favorite/'),
+            ('delete', '/api/recipes/abc/favorite/'),
+            ('get', '/api/recipes/abc/shopping_cart/'),
+            ('delete', '/api/recipes/abc/shopping_cart/'),
+            ('get', '/api/users/abc/subscribe/'),
+            ('delete', '/api/users/abc/subscribe/'),
+        ):
+            with self.subTest(method=method, path=path):
+                response = getattr(self.client, method)(path)
+                self.assertEqual(response.status_code, 404)
+
+    def test_missing_pk_is_not_found(self):
+        response = self.client.delete('/api/recipes/0/favorite/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_favorite_add_and_remove(self):
+        recipe = Recipe.objects.exclude(favorite__user=self.user).first()
+        path = f'/api/recipes/{recipe.pk}/favorite/'
+        self.assertEqual(self.client.get(path).status_code, 201)
+        self.assertEqual(self.client.get(path).status_code, 400)
+        self.assertTrue(
+            Favorite.objects.filter(user=self.user, recipe=recipe).exists()
+        )
+        self.assertEqual(self.client.delete(path).status_code, 204)
+        self.assertEqual(self.client.delete(path).status_code, 400)
@@ -0,0 +1,126 @@
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from recipes import cache, shopping_list
+from recipes.counters import change_counters
+from recipes.models import Favorite, Shopping
+from users.models import Follow
+
+
+class Toggle:
+    '''
+    Rows linking the user to targets (favorites, cart, follows).
+    add is one INSERT ... ON CONFLICT DO NOTHING and remove one DELETE,
+    both return the target ids that actually changed, so concurrent
+    clicks can't hit the unique constraint.
+    Raw statements send no signals, counter and on_add / on_remove
+    do what the receivers in recipes.signals do for ORM writes.
+    Model defaults aren't applied either, timestamp names the field
+    set to now on add
+    '''
+
+    def __init__(self, model, target, counter=None,
+                 on_add=None, on_remove=None, timestamp=None):
+        self.model = model
+        self.user_field = model._meta.get_field('user')
+        self.target_field = model._meta.get_field(target)
+        self.timestamp_field = (
+            model._meta.get_field(timestamp) if timestamp else None
+        )
+        self.counter = counter
+        self.on_add = on_add
+        self.on_remove = on_remove
+
+    def clean(self, target_ids):
+        '''
+        Target ids as the database expects them without duplicates,
+        ids that can't be one (like a non-numeric pk from the URL)
+        are dropped: there is no row to change for them
+        '''
+        to_python = self.target_field.target_field.to_python
+        cleaned = []
+        for target_id in target_ids:
+            try:
+                cleaned.append(to_python(target_id))
+            except ValidationError:
+                continue
+        return list(dict.fromkeys(cleaned))
+
+    def execute(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def add(self, user, target_ids):
+        target_ids = self.clean(target_ids)
+        if not target_ids:
+            return []
+        quote = connection.ops.quote_name
+        fields = [self.user_field, self.target_field]
+        extra = []
+        if self.timestamp_field:
+            fields.append(self.timestamp_field)
+            extra.append(self.timestamp_field.get_db_prep_value(
+                timezone.now(), connection
+            ))
+        row = '({})'.format(', '.join(['%s'] * len(fields)))
+        with transaction.atomic():
+            added = self.execute(
+                'INSERT INTO {} ({}) VALUES {} '
+                'ON CONFLICT DO NOTHING RETURNING {}'.format(
+                    quote(self.model._meta.db_table),
+                    ', '.join(quote(field.column) for field in fields),
+                    ', '.join([row] * len(target_ids)),
+                    quote(self.target_field.column),
+                ),
+                [
+                    value for target_id in target_ids
+                    for value in (user.pk, target_id, *extra)
+                ]
+            )
+            self.changed(user, added, 1, self.on_add)
+        return added
+
+    def remove(self, user, target_ids):
+        target_ids = self.clean(target_ids)
+        if not target_ids:
+            return []
+        quote = connection.ops.quote_name
+        target = quote(self.target_field.column)
+        with transaction.atomic():
+            removed = self.execute(
+                'DELETE FROM {} WHERE {} = %s AND {} IN ({}) '
+                'RETURNING {}'.format(
+                    quote(self.model._meta.db_table),
+                    quote(self.user_field.column), target,
+                    ', '.join(['%s'] * len(target_ids)),
+                    target,
+                ),
+                [user.pk, *target_ids]
+            )
+            self.changed(user, removed, -1, self.on_remove)
+        return removed
+
+    def changed(self, user, target_ids, delta, hook):
+        if not target_ids:
+            return
+        if self.counter:
+            change_counters(
+                self.target_field.related_model, target_ids,
+                self.counter, delta
+            )
+        if hook:
+            hook(user.pk, target_ids)
+        transaction.on_commit(lambda: cache.touch_table(self.model))
+
+
+favorites = Toggle(
+    Favorite, 'recipe', counter='favorites_count', timestamp='created'
+)
+shopping_cart = Toggle(
+    Shopping, 'recipe', counter='shopping_count',
+    on_add=shopping_list.add_recipes, on_remove=shopping_list.remove_recipes,
+    timestamp='created',
+)
+follows = Toggle(Follow, 'author')
@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from recipes.concurrency import as_async_view
 from recipes.views import IngredientViewSet, RecipeViewSet, TagViewSet
 
 router = DefaultRouter()
@@ -8,7 +10,41 @@ router.register('tags', TagViewSet, basename='Tags')
 router.register('ingredients', IngredientViewSet, basename='Ingredients')
 router.register('recipes', RecipeViewSet, basename='Recipes')
 
+async_urlpatterns = [
+    path(
+        'tags/', as_async_view(TagViewSet, {'get': 'list'}),
+        name='Tags-list'
+    ),
+    path(
+        'tags/<int:pk>/',
+        as_async_view(TagViewSet, {'get': 'retrieve'}),
+        name='Tags-detail'
+    ),
+    path(
+        'ingredients/', as_async_view(IngredientViewSet, {'get': 'list'}),
+        name='Ingredients-list'
+    ),
+    path(
+        'ingredients/<int:pk>/',
+        as_async_view(IngredientViewSet, {'get': 'retrieve'}),
+        name='Ingredients-detail'
+    ),
+    path('recipes/', as_async_view(
+        RecipeViewSet, {'get': 'list', 'post': 'create'},
+        concurrent_queries=True
+    ), name='Recipes-list'),
+    path('recipes/<int:pk>/', as_async_view(
+        RecipeViewSet, {
+            'get': 'retrieve', 'put': 'update',
+            'patch': 'partial_update', 'delete': 'destroy',
+        },
+        concurrent_queries=True
+    ), name='Recipes-detail'),
+]
 
 urlpatterns = [
     path('', include(router.urls)),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = async_urlpatterns + urlpatterns
@@ -1,6 +1,10 @@
+from functools import partial
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Exists, OuterRef, Sum
-from django.http.response import HttpResponse
+from django.db import transaction
+from django.db.models import F
+from django.http.response import HttpResponse, StreamingHttpResponse
 from django.utils.translation import gettext_lazy as _
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions, status
@@ -9,36 +13,55 @@ from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
+from recipes import cache, feed, matching, scoring, search, toggles
 from recipes.filters import IngredientFilter, RecipeFilter
+from recipes.mixins import (
+    CachedListRetrieveMixin, CompactListMixin, ConcurrentQueriesMixin,
+    ConditionalGetMixin,
+)
 from recipes.models import (
-    Favorite, Ingredient, IngredientInRecipe, Recipe, Shopping, Tag,
+    Favorite, Ingredient, IngredientInRecipe, Recipe, Shopping,
+    ShoppingListItem, Tag,
 )
-from recipes.pagination import CustomPagination
+from recipes.pagination import CustomPagination, FeedPagination
 from recipes.permissions import IsOwnerOrReadOnly
+from recipes.renderers import (
+    CSVShoppingListRenderer, FormatNegotiation, PDFShoppingListRenderer,
+    TextShoppingListRenderer,
+)
 from recipes.serializers import (
-    CreateRecipeSerializer, IngredientSerializer, RecipeSerializer,
-    ShotRecipeSerializer, TagSerializer,
+    CreateRecipeSerializer, FastRecipeSerializer, IngredientSerializer,
+    RecipeMatchQuerySerializer, RecipeMatchSerializer, RecipeSerializer,
+    ShoppingListItemSerializer, ShotRecipeSerializer, TagSerializer,
+    ToggleBatchSerializer,
 )
+from users.models import Follow
 
 User = get_user_model()
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(ConditionalGetMixin, ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [permissions.AllowAny]
     pagination_class = None
+    version_models = (Tag, )
+    cache_max_age = settings.CATALOGUE_CACHE_MAX_AGE
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalGetMixin, ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = [permissions.AllowAny]
     filterset_class = IngredientFilter
     pagination_class = None
+    version_models = (Ingredient, )
+    cache_max_age = settings.CATALOGUE_CACHE_MAX_AGE
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, CompactListMixin,
+                    CachedListRetrieveMixin, ConcurrentQueriesMixin,
+                    ModelViewSet):
     serializer_class = RecipeSerializer
     permission_classes = [
         permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly
@@ -46,118 +69,211 @@ class RecipeViewSet(ModelViewSet):
     pagination_class = CustomPagination
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
+    cache_prefix = 'recipes'
+    conditional_actions = ('retrieve', )
+    version_models = (
+        Recipe, IngredientInRecipe, Ingredient, Tag, User,
+    )
+    user_version_models = (Favorite, Shopping, Follow)
+    uncached_params = ('is_favorited', 'is_in_shopping_cart')
 
     def get_queryset(self):
-        queryset = Recipe.objects.annotate(
-            is_favorited=Exists(
-                Favorite.objects.filter(
-                    user=self.request.user.pk, recipe=OuterRef('pk')
-                )
-            ),
-            is_in_shopping_cart=Exists(
-                Shopping.objects.filter(
-                    user=self.request.user.pk, recipe=OuterRef('pk')
-                )
-            )
-        ).order_by('-id')
-        return queryset
+        queryset = Recipe.objects.all()
+        if self.action in ('list', 'retrieve'):
+            return queryset.for_read(self.get_flags_user())
+        if self.action == 'feed':
+            return queryset.for_read(self.request.user)
+        return queryset.with_user_flags(self.request.user)
+
+    def get_cache_version(self, request):
+        # Scores come from score_recipes, a process of its own that
+        # can't invalidate the cache of workers that don't share it
+        if request.query_params.get('ordering') in scoring.ORDERINGS:
+            return scoring.scores_version()
+        return None
 
     def get_permissions(self):
-        if self.action in ('favorite',
-                           'download_shopping_cart', 'shopping_cart'):
+        if self.action in ('favorite', 'download_shopping_cart',
+                           'shopping_cart', 'shopping_list',
+                           'favorite_batch', 'shopping_cart_batch',
+                           'feed'):
             self.permission_classes = [permissions.IsAuthenticated]
+        elif self.action == 'cache_stats':
+            self.permission_classes = [permissions.IsAdminUser]
         return super().get_permissions()
 
     def get_serializer_class(self):
-        if self.request.method in ('POST', 'PUT', 'PATCH'):
+        if self.action in ('create', 'update', 'partial_update'):
             return CreateRecipeSerializer
+        if (self.action in ('list', 'retrieve', 'feed')
+                and settings.FAST_SERIALIZERS):
+            return FastRecipeSerializer
         return self.serializer_class
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def perform_destroy(self, instance):
+        # The cascade sends a signal for every ingredient amount
+        with transaction.atomic(), search.deferred():
+            instance.delete()
+
+    def toggle(self, toggle, pk, errors):
+        '''
+        GET adds the recipe, DELETE removes it, errors has the messages
+        for 'exists' and 'missing'
+        '''
+        if self.request.method == 'DELETE':
+            if toggle.remove(self.request.user, [pk]):
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            get_object_or_404(Recipe, id=pk)
+            return Response(
+                {'errors': errors['missing']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        recipe = get_object_or_404(Recipe, id=pk)
+        if not toggle.add(self.request.user, [recipe.pk]):
+            return Response(
+                {'errors': errors['exists']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = self.get_serializer(recipe)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def toggle_batch(self, toggle):
+        serializer = self.get_serializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({
+            'added': toggle.add(
+                self.request.user, serializer.validated_data['add']
+            ),
+            'removed': toggle.remove(
+                self.request.user, serializer.validated_data['remove']
+            ),
+        })
+
     @action(
         detail=True, methods=['get', 'delete'],
         serializer_class=ShotRecipeSerializer
     )
     def favorite(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
-        if self.request.method == 'GET':
-            if Favorite.objects.filter(
-                user=request.user, recipe=recipe
-            ).exists():
-                return Response(
-                    {'errors': _(
-                        'The recipe is already in your favorite list'
-                    )},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            Favorite.objects.create(
-                user=request.user, recipe=recipe
-            )
-            serializer = self.get_serializer(recipe)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        elif self.request.method == 'DELETE':
-            if not Favorite.objects.filter(
-                user=request.user, recipe=recipe
-            ).exists():
-                return Response(
-                    {'errors': _('The recipe isn\'t in your favorite list')},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            Favorite.objects.get(user=request.user, recipe=recipe).delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response({'errors': _('Unknown error')},
-                        status=status.HTTP_400_BAD_REQUEST)
+        return self.toggle(toggles.favorites, pk, {
+            'exists': _('The recipe is already in your favorite list'),
+            'missing': _('The recipe isn\'t in your favorite list'),
+        })
 
     @action(
         detail=True, methods=['get', 'delete'],
         serializer_class=ShotRecipeSerializer
     )
     def shopping_cart(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
-        if self.request.method == 'GET':
-            if Shopping.objects.filter(
-                user=request.user, recipe=recipe
-            ).exists():
-                return Response(
-                    {'errors': _(
-                        'The recipe is already in your shopping list'
-                    )},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            Shopping.objects.create(
-                user=request.user, recipe=recipe
-            )
-            serializer = self.get_serializer(recipe)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        elif self.request.method == 'DELETE':
-            if not Shopping.objects.filter(
-                user=request.user, recipe=recipe
-            ).exists():
-                return Response(
-                    {'errors': _('The recipe isn\'t in your shopping list')},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            Shopping.objects.get(user=request.user, recipe=recipe).delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response({'errors': _('Unknown error')},
-                        status=status.HTTP_400_BAD_REQUEST)
+        return self.toggle(toggles.shopping_cart, pk, {
+            'exists': _('The recipe is already in your shopping list'),
+            'missing': _('The recipe isn\'t in your shopping list'),
+        })
 
-    @action(detail=False, methods=['get'])
+    @action(
+        detail=False, methods=['post'], url_path='favorite',
+        serializer_class=ToggleBatchSerializer
+    )
+    def favorite_batch(self, request):
+        return self.toggle_batch(toggles.favorites)
+
+    @action(
+        detail=False, methods=['post'], url_path='shopping_cart',
+        serializer_class=ToggleBatchSerializer
+    )
+    def shopping_cart_batch(self, request):
+        return self.toggle_batch(toggles.shopping_cart)
+
+    @action(
+        detail=False, methods=['get'],
+        content_negotiation_class=FormatNegotiation,
+        renderer_classes=[
+            TextShoppingListRenderer, CSVShoppingListRenderer,
+            PDFShoppingListRenderer,
+        ]
+    )
     def download_shopping_cart(self, request):
         user = request.user
-        shopping_list = IngredientInRecipe.objects.filter(
-            recipe__shopping__user=user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-        filename = f'{user.username}\'s_shopping_list.txt'
-        result = []
-        for ingredient in shopping_list:
-            result.append(
-                f'{ingredient["ingredient__name"]} - {ingredient["amount"]} '
-                + f'{ingredient["ingredient__measurement_unit"]};\n')
-        response = HttpResponse(result, content_type='text/plain')
+        shopping_list = ShoppingListItem.objects.filter(user=user).values(
+            'ingredient__name', 'ingredient__measurement_unit',
+            amount=F('total_amount')
+        ).order_by('ingredient__name')
+        renderer = request.accepted_renderer
+        filename = f'{user.username}\'s_shopping_list.{renderer.format}'
+        content = renderer.content(
+            shopping_list.iterator(), _('Shopping list')
+        )
+        if renderer.streaming:
+            response = StreamingHttpResponse(
+                content, content_type=renderer.media_type
+            )
+        else:
+            response = HttpResponse(
+                b''.join(content), content_type=renderer.media_type
+            )
         response['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
+
+    @action(detail=False, methods=['get'])
+    def shopping_list(self, request):
+        items = ShoppingListItem.objects.filter(
+            user=request.user
+        ).select_related('ingredient').order_by('ingredient__name')
+        serializer = ShoppingListItemSerializer(items, many=True)
+        return Response(serializer.data)
+
+    @action(
+        detail=False, methods=['get'],
+        serializer_class=RecipeMatchSerializer
+    )
+    def match(self, request):
+        '''
+        Recipes best covered by ?ingredients=, the ones the user has
+        '''
+        query = RecipeMatchQuerySerializer(data={
+            **request.query_params.dict(),
+            'ingredients': request.query_params.getlist('ingredients'),
+        })
+        query.is_valid(raise_exception=True)
+        matches = matching.match_recipes(
+            query.validated_data['ingredients'], query.validated_data['limit']
+        )
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'image_thumb', 'cooking_time'
+        ).in_bulk([recipe_id for recipe_id, _, _ in matches])
+        ingredients = Ingredient.objects.in_bulk({
+            pk for _, _, missing in matches for pk in missing
+        })
+        results = []
+        for recipe_id, coverage, missing in matches:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            recipe.coverage = round(coverage, 4)
+            recipe.missing = [
+                ingredients[pk] for pk in missing if pk in ingredients
+            ]
+            results.append(recipe)
+        return Response(self.get_serializer(results, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def feed(self, request):
+        '''
+        Recipes of the followed authors, newest first
+        '''
+        author_ids = list(Follow.objects.filter(
+            user=request.user
+        ).values_list('author', flat=True))
+        paginator = FeedPagination()
+        recipe_ids = paginator.paginate_ids(
+            partial(feed.recipe_page, author_ids), request
+        )
+        recipes = self.get_queryset().filter(pk__in=recipe_ids)
+        serializer = self.get_serializer(recipes.order_by('-id'), many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def cache_stats(self, request):
+        return Response(cache.get_stats())
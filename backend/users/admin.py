@@ -8,7 +8,7 @@ User = get_user_model()
 
 class UserAdmin(admin.ModelAdmin):
     list_display = ('pk', 'username', 'email', 'first_name',
-                    'last_name', 'is_staff')
+                    'last_name', 'is_staff', 'recipes_count')
     search_fields = ('username', 'email')
     list_filter = ('is_staff', )
     empty_value_display = '-empty-'
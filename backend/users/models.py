@@ -3,14 +3,43 @@ from django.db import models
 from django.utils.translation import gettext_lazy as _
 
 
-class User(AbstractUser):
+class DenormalizedFieldsMixin:
+    '''
+    save() of an existing row leaves out denormalized_fields unless
+    update_fields names them. They are changed in place with F()
+    updates, a stale value loaded with the instance would overwrite
+    the ones made concurrently
+    '''
+    denormalized_fields = ()
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        if (update_fields is None and not force_insert
+                and not self._state.adding):
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.denormalized_fields
+            ]
+        super().save(
+            force_insert=force_insert, force_update=force_update,
+            using=using, update_fields=update_fields
+        )
+
+
+class User(DenormalizedFieldsMixin, AbstractUser):
     '''
     Custom User model
     '''
+    denormalized_fields = ('recipes_count', )
+
     email = models.EmailField(_('email address'), max_length=254, unique=True)
     first_name = models.CharField(_('first name'), max_length=150)
     last_name = models.CharField(_('last_name'), max_length=150)
     password = models.CharField(_('password'), max_length=150)
+    recipes_count = models.PositiveIntegerField(
+        _('recipes count'), default=0, editable=False
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
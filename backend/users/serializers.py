@@ -3,11 +3,14 @@ from djoser.conf import settings
 from djoser.serializers import UserSerializer
 from rest_framework import serializers
 
+from foodgram.metrics import timed_serializer
+from recipes.fields import RenditionField
 from recipes.models import Recipe
 
 User = get_user_model()
 
 
+@timed_serializer
 class CustomUserSerializer(UserSerializer):
     is_subscribed = serializers.BooleanField(read_only=True)
 
@@ -20,13 +23,31 @@ class CustomUserSerializer(UserSerializer):
         extra_kwargs = {field: {'required': True} for field in fields}
 
 
+@timed_serializer
+class FastCustomUserSerializer(CustomUserSerializer):
+    '''
+    Read-only CustomUserSerializer, the dict is built straight from
+    the instance attributes with the same keys and values
+    '''
+    plain_fields = CustomUserSerializer.Meta.fields[:-1]
+
+    def to_representation(self, instance):
+        data = {field: getattr(instance, field) for field in self.plain_fields}
+        if hasattr(instance, 'is_subscribed'):
+            data['is_subscribed'] = bool(instance.is_subscribed)
+        return data
+
+
 class ShortRecipeSerializer(serializers.ModelSerializer):
+    image_thumb = RenditionField()
+
     class Meta:
         model = Recipe
-        fields = ['id', 'name', 'image', 'cooking_time']
+        fields = ['id', 'name', 'image', 'image_thumb', 'cooking_time']
         extra_kwargs = {field: {'read_only': True} for field in fields}
 
 
+@timed_serializer
 class SubscribeUserSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.BooleanField(read_only=True, default=True)
     recipes = serializers.SerializerMethodField()
@@ -44,13 +65,12 @@ class SubscribeUserSerializer(serializers.ModelSerializer):
         extra_kwargs = {field: {'read_only': True} for field in fields}
 
     def get_recipes(self, obj):
-        limit = None
-        try:
-            limit = self.context['request'].query_params['recipes_limit']
-        except Exception:
-            pass
-        queryset = obj.recipes.all()[
-            :int(limit)
-        ] if limit else obj.recipes.all()
-        serializer = ShortRecipeSerializer(queryset, many=True)
+        recipes_by_author = self.context.get('recipes_by_author')
+        if recipes_by_author is None:
+            recipes_by_author = Recipe.objects.latest_by_author(
+                [obj.pk], self.context['recipes_limit']
+            )
+        serializer = ShortRecipeSerializer(
+            recipes_by_author.get(obj.pk, []), many=True
+        )
         return serializer.data
@@ -1,13 +1,32 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from recipes.concurrency import as_async_view
 from users.views import UserViewSet
 
 user_router = DefaultRouter()
 user_router.register('users', UserViewSet, basename='Users')
 
+async_urlpatterns = [
+    path('users/', as_async_view(
+        UserViewSet, {'get': 'list', 'post': 'create'}
+    ), name='Users-list'),
+    path(
+        'users/me/', as_async_view(UserViewSet, {'get': 'me'}),
+        name='Users-me'
+    ),
+    path(
+        'users/<int:id>/',
+        as_async_view(UserViewSet, {'get': 'retrieve'}),
+        name='Users-detail'
+    ),
+]
 
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
     path('', include(user_router.urls)),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = async_urlpatterns + urlpatterns
@@ -1,18 +1,24 @@
+from django.conf import settings as django_settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
-from django.db.models import Count, Exists, OuterRef
+from django.db.models import Exists, OuterRef
 from django.utils.translation import gettext_lazy as _
 from djoser import signals
 from djoser.conf import settings
 from rest_framework import permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
+from recipes import toggles
+from recipes.models import Recipe
 from recipes.pagination import CustomPagination
 from users.mixins import CreateListRetrieveModelViewSet
 from users.models import Follow
-from users.serializers import SubscribeUserSerializer
+from users.serializers import (
+    FastCustomUserSerializer, SubscribeUserSerializer,
+)
 
 User = get_user_model()
 
@@ -28,7 +34,7 @@ class UserViewSet(CreateListRetrieveModelViewSet):
         if self.action in ('subscriptions', 'subscribe'):
             queryset = User.objects.filter(
                 following__user=self.request.user
-            ).annotate(recipes_count=Count('recipes'))
+            )
         else:
             queryset = User.objects.annotate(
                 is_subscribed=Exists(
@@ -59,8 +65,31 @@ class UserViewSet(CreateListRetrieveModelViewSet):
             return settings.SERIALIZERS.current_user
         elif self.action in ('subscriptions', 'subscribe'):
             return SubscribeUserSerializer
+        elif (self.action in ('list', 'retrieve')
+              and django_settings.FAST_SERIALIZERS):
+            return FastCustomUserSerializer
         return self.serializer_class
 
+    def get_recipes_limit(self):
+        limit = self.request.query_params.get(
+            'recipes_limit', django_settings.SUBSCRIPTION_RECIPES_LIMIT
+        )
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            limit = 0
+        if limit < 1:
+            raise ValidationError(
+                {'recipes_limit': _('Must be a positive integer')}
+            )
+        return min(limit, django_settings.SUBSCRIPTION_RECIPES_LIMIT)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ('subscriptions', 'subscribe'):
+            context['recipes_limit'] = self.get_recipes_limit()
+        return context
+
     def get_instance(self):
         return self.request.user
 
@@ -87,38 +116,42 @@ class UserViewSet(CreateListRetrieveModelViewSet):
 
     @action(methods=['get', 'delete'], detail=True)
     def subscribe(self, request, id):
+        if self.request.method == 'DELETE':
+            if toggles.follows.remove(request.user, [id]):
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            get_object_or_404(User, pk=id)
+            return Response(
+                {'errors': _('You aren\'t subscribed to this author')},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         author = get_object_or_404(User, pk=id)
-        if self.request.method == 'GET':
-            if request.user == author:
-                return Response(
-                    {'errors': _('You can\'t subscribe to yourself')},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            if Follow.objects.filter(
-                user=request.user, author=author
-            ).exists():
-                return Response(
-                    {'errors': _('You are already subscribed to this author')},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            Follow.objects.create(
-                user=request.user, author=author
+        if request.user == author:
+            return Response(
+                {'errors': _('You can\'t subscribe to yourself')},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            serializer = self.get_serializer(self.get_object())
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        elif self.request.method == 'DELETE':
-            if not Follow.objects.filter(
-                user=request.user, author=author
-            ).exists():
-                return Response(
-                    {'errors': _('You aren\'t subscribed to this author')},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            Follow.objects.get(user=request.user, author=author).delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response({'errors': _('Unknown error')},
-                        status=status.HTTP_400_BAD_REQUEST)
+        # Before the follow is stored, a bad limit leaves nothing behind
+        self.get_recipes_limit()
+        if not toggles.follows.add(request.user, [author.pk]):
+            return Response(
+                {'errors': _('You are already subscribed to this author')},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = self.get_serializer(self.get_object())
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(methods=['get'], detail=False)
     def subscriptions(self, request):
-        return self.list(request)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        authors = list(queryset) if page is None else page
+        context = self.get_serializer_context()
+        context['recipes_by_author'] = Recipe.objects.latest_by_author(
+            [author.pk for author in authors], context['recipes_limit']
+        )
+        serializer = self.get_serializer_class()(
+            authors, many=True, context=context
+        )
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)